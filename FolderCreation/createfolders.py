@@ -1,12 +1,80 @@
-import pandas as pd
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+COLUMNS = ['Class', 'Name']
+
+
+def read_roster(path):
+    # only the two columns we need, as strings - CSV and Parquet load much faster than xlsx
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(path, usecols=COLUMNS, dtype=str)
+    if ext == '.parquet':
+        return pd.read_parquet(path, columns=COLUMNS)
+    return pd.read_excel(path, usecols=COLUMNS, dtype=str)
+
+
+def folder_paths(d):
+    # each (class, name) once, sorted so the folders for a class are made together. The values are used as they
+    # are, like before - a name with a '/' in it is still a nested folder - only rows missing either are skipped
+    rows = d[COLUMNS].dropna()
+    pairs = {(str(c), str(n)) for c, n in zip(rows['Class'], rows['Name'])}
+    return sorted((c, n) for c, n in pairs if c and n)
+
+
+def make_folder(path):
+    # makedirs, since the name can have folders of its own in it
+    existed = os.path.isdir(path)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        print("Couldn't create '{}': {}".format(path, e))
+        return 'failed'
+    return 'existed' if existed else 'created'
+
+
+def create_folders(pairs, root='.', workers=8, dry_run=False, verbose=False):
+    # the class folders are made once each, up front, then the name folders on a thread pool - the
+    # time goes to waiting on the file system, so threads overlap it
+    classes = sorted({os.path.join(root, c) for c, _ in pairs})
+    paths = [os.path.join(root, c, n) for c, n in pairs]
+    if verbose or dry_run:
+        for path in paths:
+            print("{} '{}'".format('Would create' if dry_run else 'Creating', path))
+    if dry_run:
+        return {'would create': len(paths)}
+
+    for path in classes:
+        os.makedirs(path, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(make_folder, paths))
+    return {result: results.count(result) for result in ('created', 'existed', 'failed')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a Class/Name folder for every row in a roster')
+    parser.add_argument('roster', nargs='?', default='data.xlsx',
+                        help='.xlsx, .csv or .parquet file with Class and Name columns')
+    parser.add_argument('--root', default='.', help='where to create the class folders')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--dry-run', action='store_true', help="list the folders, but don't create them")
+    parser.add_argument('--verbose', action='store_true', help='print every folder as it is created')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    d = read_roster(args.roster)
+    pairs = folder_paths(d)
+    print("Found {} names, {} unique folders in {} classes.".format(
+        len(d), len(pairs), len({c for c, _ in pairs})))
 
-d = pd.read_excel('data.xlsx')
-print("Found {} names.".format(len(d)))
+    counts = create_folders(pairs, args.root, args.workers, args.dry_run, args.verbose)
+    print(', '.join('{} {}'.format(count, result) for result, count in counts.items()))
+    print("Done in {:.1f}s.".format(time.perf_counter() - started))
 
-for index, row in d.iterrows():
-    path = '{}/{}'.format(row['Class'], row['Name'])
-    print("Creating '{}'...".format(path))
-    os.makedirs(path, exist_ok=True)
 
-print("Done.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
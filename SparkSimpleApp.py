@@ -1,18 +1,68 @@
 # assuming /opt/spark is a symlink to the spark install, run this with the following
 # command line:
-# spark-submit SparkSimpleApp.py 
+# spark-submit SparkSimpleApp.py
+#
+# which counts the lines with an 'a' and the lines with a 'b' in Spark's README, like
+# the quick start does. Other files, globs and patterns go on the command line:
+# spark-submit SparkSimpleApp.py "/var/log/myapp/*.log" --pattern ERROR --pattern WARN
+# spark-submit SparkSimpleApp.py "logs/2024-*/*.gz" --regex --pattern "time=\d{4,}ms"
+#
+# All the counts come out of one aggregation - a conditional sum per pattern - so it's
+# one pass over the data and one Spark job however many patterns there are, and
+# nothing needs to be cached in between.
+
+import argparse
+import time
 
 from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+parser = argparse.ArgumentParser(description="Count the lines that match each pattern")
+parser.add_argument("inputs", nargs="*", default=["/opt/spark/README.md"],
+                    help="files, directories or globs to read as text")
+parser.add_argument("--pattern", action="append", dest="patterns",
+                    help="substring (or regex, with --regex) to count lines with; can be repeated")
+parser.add_argument("--regex", action="store_true", help="treat the patterns as Java regexes")
+parser.add_argument("--master", default="local[*]")
+parser.add_argument("--partitions", type=int,
+                    help="split the input into at least this many partitions to read in parallel")
+args = parser.parse_args()
+patterns = args.patterns or ["a", "b"]
+
+# these are wall-clock times on the driver, around each call: they include starting up, scheduling and moving results
+# back, not only the work on the executors. For per-stage and per-task times, run with
+# --conf spark.eventLog.enabled=true and look at the application in the Spark history server
+timings = {}
+started = time.perf_counter()
+builder = SparkSession.builder.appName("SparkSimpleApp").master(args.master)
+if args.partitions:
+    # a hint for how the files are split when they're read - unlike repartition(), no shuffle
+    builder = builder.config("spark.sql.files.minPartitionNum", args.partitions)
+spark = builder.getOrCreate()
+timings["start session"] = time.perf_counter() - started
 
-logFile = "/opt/spark/README.md"
-spark = SparkSession.builder.appName("foo").master("local").getOrCreate()
-logData = spark.read.text(logFile).cache()
+started = time.perf_counter()
+logData = spark.read.text(args.inputs)
+line = logData.value
+counts = [F.count(F.lit(1)).alias("lines")]
+for i, pattern in enumerate(patterns):
+    matches = line.rlike(pattern) if args.regex else line.contains(pattern)
+    counts.append(F.sum(F.when(matches, 1).otherwise(0)).alias(f"pattern_{i}"))
+aggregated = logData.agg(*counts)
+# lazy, so this is listing the files and building the plan - nothing has been read yet
+timings["plan"] = time.perf_counter() - started
 
-numAs = logData.filter(logData.value.contains('a')).count()
-numBs = logData.filter(logData.value.contains('b')).count()
+started = time.perf_counter()
+result = aggregated.first()
+# the one job that reads the data and counts
+timings["count"] = time.perf_counter() - started
+numPartitions = logData.rdd.getNumPartitions()
 
 print("----")
-print(f"Lines with a: {numAs}, lines with b: {numBs}.")
+print(f"{result['lines']} lines in {numPartitions} partitions")
+for i, pattern in enumerate(patterns):
+    print(f"Lines with {pattern}: {result[f'pattern_{i}'] or 0}")
+print("Driver wall-clock: " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
 print("----")
 
-spark.stop()
\ No newline at end of file
+spark.stop()
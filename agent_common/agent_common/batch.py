@@ -0,0 +1,101 @@
+# Runs an agent over scripted conversations from a JSONL file instead of through its input() loop, many at once.
+# Each project has a batch.py that calls main() with its own default agent:
+#
+#   python batch.py prompts.jsonl results.jsonl --agent main_openai_tools --workers 8 --rate 5
+#
+# Each input line is {"id": ..., "prompts": ["first message", "second message", ...]}, or has a single "prompt". Every
+# conversation gets a fresh history from the agent's new_conversation(), and every turn goes through the agent's own
+# process_user_input(), so the answers are the ones the REPL would have given. Finished conversations are appended to
+# the results straight away, one line each with the answer and latency of every turn, and conversations that are
+# already in there are skipped - so a run that crashed or was stopped just picks up where it left off when it's
+# started again. --parquet also writes the results as a Parquet file, one row per turn, at the end (needs pyarrow).
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import importlib
+import json
+import os
+import time
+from . import llm_client
+
+def read_conversations(path):
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            if line.strip():
+                record = json.loads(line)
+                yield str(record.get('id', number)), record.get('prompts') or [record['prompt']]
+
+def read_results(path):
+    # the latest result for each conversation; a line cut short by a crash is skipped
+    results = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                results[record['id']] = record
+    return results
+
+def run_conversation(agent, conversation_id, prompts):
+    conversation = agent.new_conversation()
+    turns = []
+    try:
+        for prompt in prompts:
+            started = time.perf_counter()
+            answer = agent.process_user_input(prompt, conversation)
+            turns.append({'prompt': prompt, 'answer': answer, 'latency': time.perf_counter() - started})
+    except Exception as e:
+        # recorded so it shows up in the results, but not counted as done, so the next run tries it again
+        return {'id': conversation_id, 'turns': turns, 'error': repr(e)}
+    return {'id': conversation_id, 'turns': turns}
+
+def write_parquet(results, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = []
+    for record in results.values():
+        for number, turn in enumerate(record['turns']):
+            rows.append({'id': record['id'], 'turn': number, **turn, 'error': None})
+        if 'error' in record:
+            rows.append({'id': record['id'], 'turn': len(record['turns']), 'prompt': None, 'answer': None,
+                         'latency': None, 'error': record['error']})
+    pq.write_table(pa.Table.from_pylist(rows), path)
+
+def main(default_agent, argv=None):
+    parser = argparse.ArgumentParser(description='Run an agent over the conversations in a JSONL file')
+    parser.add_argument('prompts', help='JSONL file with the conversations to run')
+    parser.add_argument('results', help='JSONL file the results are appended to, and resumed from')
+    parser.add_argument('--agent', default=default_agent,
+                        help=f'module with new_conversation and process_user_input (default {default_agent})')
+    parser.add_argument('--workers', type=int, default=8, help='conversations run at the same time')
+    parser.add_argument('--rate', type=float, default=None, help='most requests per second sent to the LLM')
+    parser.add_argument('--parquet', help='also write the results to this Parquet file at the end')
+    args = parser.parse_args(argv)
+
+    agent = importlib.import_module(args.agent)
+    # output from concurrent conversations would be interleaved, the answers are in the results instead
+    agent.STREAM = False
+    llm_client.client.requests_per_second = args.rate
+
+    done = {conversation_id for conversation_id, record in read_results(args.results).items() if 'error' not in record}
+    todo = [(conversation_id, prompts) for conversation_id, prompts in read_conversations(args.prompts)
+            if conversation_id not in done]
+    print(f'{len(done)} conversations already done, {len(todo)} to run')
+
+    failed = 0
+    with open(args.results, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(run_conversation, agent, conversation_id, prompts)
+                   for conversation_id, prompts in todo]
+        for count, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            failed += 'error' in record
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            print(f'{count}/{len(todo)} done, {failed} failed', end='\r')
+
+    print(f'\n{json.dumps(llm_client.client.report(), indent=2)}')
+    if args.parquet:
+        write_parquet(read_results(args.results), args.parquet)
@@ -0,0 +1,190 @@
+# Keeps the conversation history that gets sent on every llm.responses.create call within a token budget.
+# Everything before the first user message (the system/developer prompt) is always kept. Once a turn has been
+# answered, any big tool output in it - a function_call_output, or a user message passing back <info> - is cut down
+# to PAYLOAD_TOKENS, since the model has already used it and can call the tool again if it needs the rest. If the
+# history is still over budget, the oldest turns are dropped, and folded into a running summary if there's a
+# summarize function. Token counts are kept per item as items are added, so checking the budget is cheap.
+
+import json
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except ImportError:
+    _encoding = None
+
+TOKEN_BUDGET = 8000
+PAYLOAD_TOKENS = 1000
+SUMMARY_TOKENS = 500
+ITEM_OVERHEAD_TOKENS = 4
+SUMMARY_MODEL = 'gpt-4.1-nano'
+SUMMARY_PROMPT = """Summarize the conversation below for an AI assistant that will continue it. Keep facts,
+numbers, names, URLs, decisions and anything the user asked to remember; drop pleasantries. If there's a summary
+of an even earlier part of the conversation, merge it in. Answer in at most 300 words."""
+
+INFO_PATTERN = re.compile(r'<info>(.*)</info>', re.DOTALL)
+
+def count_tokens(text):
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # without tiktoken, about four characters a token is close enough for English text
+    return (len(text) + 3) // 4
+
+def truncate(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding:
+        tokens = _encoding.encode(text, disallowed_special=())
+        head = _encoding.decode(tokens[:max_tokens])
+        omitted = len(tokens) - max_tokens
+    else:
+        head = text[:max_tokens * 4]
+        omitted = count_tokens(text[max_tokens * 4:])
+    return f'{head}\n[... {omitted} more tokens omitted - call the tool again for the full text ...]'
+
+def item_value(item, key):
+    # history holds both our own dicts and the pydantic items from response.output
+    return item.get(key) if isinstance(item, dict) else getattr(item, key, None)
+
+def item_text(item):
+    if isinstance(item, dict):
+        content = item.get('content', item.get('output', ''))
+        return content if isinstance(content, str) else json.dumps(content)
+    return item.model_dump_json(exclude_none=True)
+
+def item_tokens(item):
+    return count_tokens(item_text(item)) + ITEM_OVERHEAD_TOKENS
+
+def is_turn_start(item):
+    # a message passing back <info> has the user role too, but it belongs to the turn it answers
+    content = item_value(item, 'content')
+    return item_value(item, 'role') == 'user' and not (isinstance(content, str) and INFO_PATTERN.search(content))
+
+def transcript_line(item):
+    item_type = item_value(item, 'type')
+    if item_type == 'function_call':
+        return f"tool call: {item_value(item, 'name')}({item_value(item, 'arguments')})"
+    if item_type == 'function_call_output':
+        return f"tool output: {item_value(item, 'output')}"
+    if item_type == 'reasoning':
+        return None
+    content = item_value(item, 'content')
+    if not isinstance(content, str):
+        content = ''.join(getattr(part, 'text', '') for part in content or [])
+    return f"{item_value(item, 'role')}: {content}"
+
+def summarizer(llm, model=SUMMARY_MODEL):
+    # returns a summarize function for History that uses a (cheap) model, through the llm_client wrapper, to fold dropped turns into the summary
+    def summarize(summary, items):
+        transcript = '\n'.join(line for line in map(transcript_line, items) if line)
+        response = llm.create(
+            model = model,
+            input = [
+                {'role': 'developer', 'content': SUMMARY_PROMPT},
+                {'role': 'user', 'content': f'Earlier summary: {summary or "(none)"}\n\nConversation:\n{transcript}'}
+            ]
+        )
+        return response.output_text
+    return summarize
+
+class History:
+    def __init__(self, items=(), budget=TOKEN_BUDGET, payload_tokens=PAYLOAD_TOKENS, summarize=None):
+        self.budget = budget
+        self.payload_tokens = payload_tokens
+        self.summarize = summarize
+        self.items = []
+        self.counts = []
+        self.tokens = 0
+        self.summary = None
+        self.summary_text = None
+        self.extend(items)
+
+    def append(self, item):
+        count = item_tokens(item)
+        self.items.append(item)
+        self.counts.append(count)
+        self.tokens += count
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def _replace(self, index, item):
+        count = item_tokens(item)
+        self.tokens += count - self.counts[index]
+        self.items[index] = item
+        self.counts[index] = count
+
+    def _remove(self, start, end):
+        self.tokens -= sum(self.counts[start:end])
+        del self.items[start:end]
+        del self.counts[start:end]
+
+    def _shrink(self, index, max_tokens):
+        item = self.items[index]
+        if not isinstance(item, dict) or self.counts[index] <= max_tokens + ITEM_OVERHEAD_TOKENS:
+            return
+        if item.get('type') == 'function_call_output':
+            self._replace(index, {**item, 'output': truncate(item['output'], max_tokens)})
+        elif isinstance(item.get('content'), str):
+            match = INFO_PATTERN.search(item['content'])
+            if match:
+                info = truncate(match.group(1), max_tokens)
+                content = item['content'][:match.start(1)] + info + item['content'][match.end(1):]
+                self._replace(index, {**item, 'content': content})
+
+    def _turn_starts(self):
+        return [i for i, item in enumerate(self.items) if is_turn_start(item)]
+
+    def _update_summary(self, dropped, first_turn):
+        self.summary_text = truncate(self.summarize(self.summary_text, dropped), SUMMARY_TOKENS)
+        summary = {'role': 'developer', 'content': f'Summary of the earlier conversation: {self.summary_text}'}
+        if self.summary is not None:
+            # the summary always sits right after the system prompt, in front of the first turn
+            self._remove(first_turn - 1, first_turn)
+            first_turn -= 1
+        self.items.insert(first_turn, summary)
+        self.counts.insert(first_turn, item_tokens(summary))
+        self.tokens += self.counts[first_turn]
+        self.summary = summary
+
+    def fit(self):
+        # compacts the history in place if it's over budget and returns the items to send
+        starts = self._turn_starts()
+        if not starts:
+            return self.items
+
+        for index in range(starts[0], starts[-1]):
+            self._shrink(index, self.payload_tokens)
+
+        # leave room for the summary that replaces whatever gets dropped
+        reserve = 0
+        if self.summarize:
+            reserve = SUMMARY_TOKENS + ITEM_OVERHEAD_TOKENS - (self.counts[starts[0] - 1] if self.summary else 0)
+
+        dropped = []
+        while self.tokens + reserve > self.budget and len(starts) > 1:
+            dropped += self.items[starts[0]:starts[1]]
+            self._remove(starts[0], starts[1])
+            starts = [start - (starts[1] - starts[0]) for start in starts[1:]]
+        if dropped and self.summarize:
+            self._update_summary(dropped, starts[0])
+            starts = self._turn_starts()
+
+        # only the latest turn is left, so its tool outputs have to be cut down as well
+        if self.tokens > self.budget:
+            for index in range(starts[-1], len(self.items)):
+                self._shrink(index, self.payload_tokens)
+
+        return self.items
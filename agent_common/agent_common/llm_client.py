@@ -0,0 +1,205 @@
+# One shared wrapper around the OpenAI client for the agent scripts, instead of each script making its own OpenAI():
+# - all calls in the process go through one OpenAI client, so they share its pool of keep-alive connections instead
+#   of each script (and the history summarizer) opening its own
+# - the stable start of every prompt - the tools, the instructions and the system/developer messages in front of
+#   the conversation - is kept in a fixed order and hashed into prompt_cache_key, so requests that share it are routed
+#   to the same prompt cache on OpenAI's side and only the new part of the conversation has to be processed
+# - deterministic calls (temperature=0, or cache=True) are cached on disk, keyed by a hash of the whole request, and
+#   replayed from there - as a stream of events too, when the caller asked for one - instead of being sent again
+# - cache hits and misses, latencies and the prompt tokens OpenAI served from its cache are counted in metrics
+# - requests_per_second, when set, spaces out the requests that actually go to OpenAI across all threads
+# - every call is a tracing span with its token usage, when tracing is on
+
+from openai import OpenAI
+from openai.types.responses import (Response, ResponseCompletedEvent, ResponseOutputItemDoneEvent,
+                                    ResponseTextDeltaEvent)
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from . import tracing
+
+CACHE_DIR = os.path.expanduser('~/.cache/llm_client/responses')
+TIMEOUT = 120
+PREFIX_ROLES = ('system', 'developer')
+
+def jsonable(item):
+    # the input can hold pydantic items from response.output as well as plain dicts
+    if hasattr(item, 'model_dump'):
+        return item.model_dump(mode='json', exclude_none=True)
+    raise TypeError(f'{type(item).__name__} is not JSON serializable')
+
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=jsonable).encode()).hexdigest()
+
+def role(item):
+    return item.get('role') if isinstance(item, dict) else getattr(item, 'role', None)
+
+def stable_prefix(params):
+    items = params.get('input')
+    leading = []
+    if isinstance(items, list):
+        for item in items:
+            if role(item) not in PREFIX_ROLES:
+                break
+            leading.append(item)
+    return [params.get('model'), params.get('instructions'), params.get('tools'), leading]
+
+def replay_events(response):
+    # the events a streaming call would have produced for response, as far as streaming.stream_response needs them
+    sequence_number = 0
+    for output_index, item in enumerate(response.output):
+        for content_index, part in enumerate(getattr(item, 'content', None) or []):
+            if part.type == 'output_text':
+                yield ResponseTextDeltaEvent.model_construct(
+                    type='response.output_text.delta', delta=part.text, item_id=item.id, output_index=output_index,
+                    content_index=content_index, logprobs=[], sequence_number=sequence_number)
+                sequence_number += 1
+        yield ResponseOutputItemDoneEvent.model_construct(
+            type='response.output_item.done', item=item, output_index=output_index, sequence_number=sequence_number)
+        sequence_number += 1
+    yield ResponseCompletedEvent.model_construct(
+        type='response.completed', response=response, sequence_number=sequence_number)
+
+class Client:
+    def __init__(self, cache_dir=CACHE_DIR, requests_per_second=None, **openai_kwargs):
+        self.cache_dir = cache_dir
+        self.requests_per_second = requests_per_second
+        self._next_request_at = 0
+        self.openai_kwargs = openai_kwargs
+        self._openai = None
+        self._lock = threading.Lock()
+        self.metrics = {'calls': 0, 'cache_hits': 0, 'cache_misses': 0, 'latencies': [], 'input_tokens': 0,
+                        'cached_input_tokens': 0}
+
+    @property
+    def openai(self):
+        # made on first use rather than at import, so the scripts' load_dotenv() has run by then
+        if self._openai is None:
+            self._openai = OpenAI(timeout=TIMEOUT, **self.openai_kwargs)
+        return self._openai
+
+    def _wait_for_slot(self):
+        if not self.requests_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + 1 / self.requests_per_second
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _load(self, key):
+        try:
+            with open(self._cache_path(key), encoding='utf-8') as f:
+                # built the same lenient way the SDK builds responses from the API, so a field that's missing or
+                # changed type between SDK versions doesn't throw the entry away
+                return Response.construct(**json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _store(self, key, response):
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(response.model_dump_json())
+        os.replace(tmp_path, path)
+
+    def _record(self, started, response=None, cache_hit=None, span=tracing.NO_SPAN):
+        usage = getattr(response, 'usage', None)
+        span.set_attribute('llm.cache_hit', cache_hit)
+        span.set_attribute('gen_ai.response.model', getattr(response, 'model', None))
+        if usage and not cache_hit:
+            details = usage.input_tokens_details
+            span.add('gen_ai.usage.input_tokens', usage.input_tokens)
+            span.add('gen_ai.usage.output_tokens', usage.output_tokens)
+            span.add('gen_ai.usage.cached_input_tokens', (details.cached_tokens or 0) if details else 0)
+        span.end()
+
+        with self._lock:
+            self.metrics['calls'] += 1
+            self.metrics['latencies'].append(time.perf_counter() - started)
+            if cache_hit is not None:
+                self.metrics['cache_hits' if cache_hit else 'cache_misses'] += 1
+            if usage and not cache_hit:
+                self.metrics['input_tokens'] += usage.input_tokens
+                details = usage.input_tokens_details
+                self.metrics['cached_input_tokens'] += (details.cached_tokens or 0) if details else 0
+
+    def _recorded_stream(self, events, started, key, span):
+        response = None
+        try:
+            for event in events:
+                if event.type in ('response.completed', 'response.incomplete', 'response.failed'):
+                    response = event.response
+                yield event
+            self._record(started, response, cache_hit=False if key else None, span=span)
+        except Exception as e:
+            span.record_error(e)
+            raise
+        finally:
+            # also when the caller stops reading part way, since the trace it's in is only written once it's ended
+            span.end()
+        if key and response is not None and response.status == 'completed':
+            self._store(key, response)
+
+    def create(self, cache=None, **params):
+        # same arguments as llm.responses.create, and returns the same thing - a Response, or an iterator of events
+        # with stream=True; cache=True/False turns the on-disk cache on or off regardless of the temperature
+        if params.get('tools'):
+            params['tools'] = sorted(params['tools'], key=lambda tool: tool.get('name', ''))
+        params.setdefault('prompt_cache_key', digest(stable_prefix(params))[:32])
+
+        started = time.perf_counter()
+        stream = params.get('stream', False)
+        # not made the current span, since a streamed response only ends once the caller has read it all
+        span = tracing.start_span(f"responses.create {params.get('model')}", {
+            'gen_ai.system': 'openai',
+            'gen_ai.request.model': params.get('model'),
+            'llm.stream': stream
+        }, tracing.KIND_CLIENT)
+        key = None
+        if cache if cache is not None else params.get('temperature') == 0:
+            key = digest({name: value for name, value in params.items() if name != 'stream'})
+            cached = self._load(key)
+            if cached is not None:
+                self._record(started, cached, cache_hit=True, span=span)
+                return replay_events(cached) if stream else cached
+
+        self._wait_for_slot()
+        started = time.perf_counter()
+        try:
+            response = self.openai.responses.create(**params)
+        except Exception as e:
+            span.record_error(e)
+            span.end()
+            raise
+        if stream:
+            return self._recorded_stream(response, started, key, span)
+        self._record(started, response, cache_hit=False if key else None, span=span)
+        if key and response.status == 'completed':
+            self._store(key, response)
+        return response
+
+    def report(self):
+        with self._lock:
+            latencies = sorted(self.metrics['latencies'])
+            lookups = self.metrics['cache_hits'] + self.metrics['cache_misses']
+            input_tokens = self.metrics['input_tokens']
+            return {
+                'calls': self.metrics['calls'],
+                'cache_hits': self.metrics['cache_hits'],
+                'cache_misses': self.metrics['cache_misses'],
+                'cache_hit_rate': self.metrics['cache_hits'] / lookups if lookups else None,
+                'mean_latency': sum(latencies) / len(latencies) if latencies else None,
+                'p95_latency': latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+                'prompt_cache_rate': self.metrics['cached_input_tokens'] / input_tokens if input_tokens else None
+            }
+
+client = Client()
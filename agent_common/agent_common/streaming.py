@@ -0,0 +1,44 @@
+# Helpers for streaming responses (llm.responses.create(..., stream=True)). Text is printed as it arrives instead of
+# once the whole response has been generated, and each function call is handed over as soon as the model has finished
+# writing it, so the tool can already be running while the rest of the response streams in. stream_response returns
+# the same response object a non-streaming call does, so history is still built from response.output/output_text.
+
+import sys
+
+class Printer:
+    # prints the text deltas of one response, with the prefix in front once there's any text at all
+    def __init__(self, prefix='\nAssistant: '):
+        self.prefix = prefix
+        self.started = False
+
+    def __call__(self, delta):
+        if not delta:
+            return
+        if not self.started:
+            sys.stdout.write(self.prefix)
+            self.started = True
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+
+    def end(self):
+        if self.started:
+            sys.stdout.write('\n\n')
+            sys.stdout.flush()
+
+def stream_response(events, on_text=None, on_function_call=None):
+    response = None
+    for event in events:
+        if event.type == 'response.output_text.delta':
+            if on_text:
+                on_text(event.delta)
+        elif event.type == 'response.output_item.done':
+            if event.item.type == 'function_call' and on_function_call:
+                on_function_call(event.item)
+        elif event.type in ('response.completed', 'response.incomplete', 'response.failed'):
+            response = event.response
+        elif event.type == 'error':
+            raise RuntimeError(f'error while streaming the response: {event.message}')
+
+    if response is None:
+        raise RuntimeError('the response stream ended before the response was complete')
+    return response
@@ -0,0 +1,220 @@
+# Lightweight tracing for the agent scripts: model calls, tool calls, web page fetches and whole turns are timed as
+# spans, with token usage from the responses as attributes (and added up on the turn they belong to). Spans are
+# written to a local file in the OpenTelemetry OTLP/JSON format, one export request per line, like the collector's
+# file exporter writes them, so they can be loaded into anything that reads OTLP.
+#
+# Tracing is off unless AGENT_TRACE_FILE is set (or configure() is called). It's looked up when spans are started
+# rather than at import, so a .env file loaded by the script after its imports counts too. When it's off, span()
+# hands back one shared no-op object and traced() functions just call straight through, so it costs next to nothing.
+#
+# A trace is written once all of its spans have ended, not when its root span does, so spans still running on
+# other threads when the turn ends - a request whose answer wasn't waited for - are written with the rest.
+
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+SCOPE_NAME = 'agent-tracing'
+
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_UNSET = object()
+_configured_file = _UNSET
+current_span = contextvars.ContextVar('current_span', default=None)
+# the root span of every trace that hasn't been written yet
+_open_traces = set()
+_lock = threading.Lock()
+
+def configure(path):
+    # turns tracing on, writing to path, or off with None, whatever AGENT_TRACE_FILE says
+    global _configured_file
+    flush()
+    _configured_file = path
+
+def trace_file():
+    return os.getenv('AGENT_TRACE_FILE') if _configured_file is _UNSET else _configured_file
+
+def enabled():
+    return trace_file() is not None
+
+def service_name():
+    return os.getenv('OTEL_SERVICE_NAME') or os.path.splitext(os.path.basename(sys.argv[0] or 'agent'))[0]
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+class Span:
+    def __init__(self, name, attributes=None, kind=KIND_INTERNAL, parent=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else f'{random.getrandbits(128):032x}'
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.attributes = dict(attributes or {})
+        self.status = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.root = parent.root if parent else self
+        with _lock:
+            if parent is None:
+                self.open_spans = 0
+                self.ended = []
+                self.file = trace_file()
+            # again, if the trace was written but a span in it was still handed on to start another
+            _open_traces.add(self.root)
+            self.root.open_spans += 1
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            with _lock:
+                self.attributes[key] = value
+
+    def add(self, key, value):
+        # adds value to the attribute on this span and every span it's part of, e.g. tokens used to the turn - under
+        # the lock, since spans on other threads can be adding to the same ancestors
+        with _lock:
+            span = self
+            while span is not None:
+                span.attributes[key] = span.attributes.get(key, 0) + value
+                span = span.parent
+
+    def record_error(self, error):
+        with _lock:
+            self.status = {'code': STATUS_ERROR, 'message': str(error)}
+            self.attributes['exception.type'] = type(error).__name__
+
+    def end(self):
+        with _lock:
+            if self.end_ns is not None:
+                return
+            self.end_ns = time.time_ns()
+            root = self.root
+            root.ended.append(self)
+            root.open_spans -= 1
+            # spans are written once a whole trace is done, rather than one write per span
+            if root.open_spans == 0:
+                _open_traces.discard(root)
+                _write(root)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': otlp_value(value)} for key, value in self.attributes.items()],
+            'status': self.status or {'code': STATUS_OK}
+        }
+        if self.parent:
+            span['parentSpanId'] = self.parent.span_id
+        return span
+
+class NoSpan:
+    # what span()/start_span() give back when tracing is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def add(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+NO_SPAN = NoSpan()
+
+def _write(root):
+    # writes the spans of root's trace that have ended so far; called with _lock held
+    spans, root.ended = root.ended, []
+    if not spans or root.file is None:
+        return
+    request = {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': otlp_value(service_name())}]},
+            'scopeSpans': [{'scope': {'name': SCOPE_NAME}, 'spans': [span.to_otlp() for span in spans]}]
+        }]
+    }
+    with open(root.file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(request) + '\n')
+
+def flush():
+    # writes what has ended of the traces that are still going, e.g. at exit
+    with _lock:
+        for root in list(_open_traces):
+            _write(root)
+
+atexit.register(flush)
+
+def start_span(name, attributes=None, kind=KIND_INTERNAL):
+    # a span that isn't made the current one - for something that ends somewhere else, like a streamed response
+    if not enabled():
+        return NO_SPAN
+    return Span(name, attributes, kind, parent=current_span.get())
+
+@contextlib.contextmanager
+def _span(name, attributes, kind):
+    span = Span(name, attributes, kind, parent=current_span.get())
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+def span(name, attributes=None, kind=KIND_INTERNAL):
+    # with tracing.span('name') as span: ... times the block, and makes it the parent of the spans started in it
+    if not enabled():
+        return NO_SPAN
+    return _span(name, attributes, kind)
+
+def add(key, value):
+    # adds value to an attribute of the current span and the spans it's part of
+    span = current_span.get()
+    if span is not None:
+        span.add(key, value)
+
+def traced(name, kind=KIND_INTERNAL):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return function(*args, **kwargs)
+            with _span(name, None, kind):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def in_context(function):
+    # for handing work to another thread: the function runs with the current span as its parent there too
+    if current_span.get() is None:
+        return function
+    return functools.partial(contextvars.copy_context().run, function)
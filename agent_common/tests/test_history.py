@@ -0,0 +1,82 @@
+import pytest
+from agent_common import history
+from agent_common.history import History
+
+PROMPT = {'role': 'developer', 'content': 'You are a helpful assistant.'}
+
+def turn(number, output_words=100):
+    return [
+        {'role': 'user', 'content': f'question {number}'},
+        {'type': 'function_call', 'call_id': f'call_{number}', 'name': 'read_webpage', 'arguments': '{}'},
+        {'type': 'function_call_output', 'call_id': f'call_{number}', 'output': 'word ' * output_words},
+        {'role': 'assistant', 'content': f'answer {number}'},
+    ]
+
+class StubSummarize:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, summary, items):
+        self.calls.append((summary, items))
+        return f'summary {len(self.calls)}'
+
+def summaries(items):
+    return [item for item in items if str(item.get('content', '')).startswith('Summary of the earlier conversation')]
+
+def check(conversation):
+    assert conversation.tokens == sum(conversation.counts)
+    assert conversation.counts == [history.item_tokens(item) for item in conversation.items]
+    assert conversation.items[0] is PROMPT
+    # every tool call is followed by its output
+    for index, item in enumerate(conversation.items):
+        if item.get('type') == 'function_call':
+            assert conversation.items[index + 1]['call_id'] == item['call_id']
+        if item.get('type') == 'function_call_output':
+            assert conversation.items[index - 1]['call_id'] == item['call_id']
+
+def test_dropped_turns_are_folded_into_one_summary_after_the_prompt():
+    summarize = StubSummarize()
+    conversation = History([PROMPT], budget=1000, payload_tokens=50, summarize=summarize)
+    for number in range(10):
+        conversation += turn(number)
+        conversation.fit()
+        check(conversation)
+        assert conversation.tokens <= conversation.budget
+
+    assert summarize.calls
+    # each summary is built from the one before, and replaces it
+    assert [summary for summary, _ in summarize.calls] == [None] + [f'summary {n}' for n in range(1, len(summarize.calls))]
+    assert summaries(conversation.items) == [conversation.items[1]]
+    assert conversation.items[1]['content'].endswith(f'summary {len(summarize.calls)}')
+    assert history.is_turn_start(conversation.items[2])
+    assert conversation.items[-4:] == turn(9)
+
+def test_turns_are_dropped_whole_without_a_summarizer():
+    conversation = History([PROMPT], budget=300, payload_tokens=20)
+    for number in range(6):
+        conversation += turn(number, output_words=10)
+        conversation.fit()
+        check(conversation)
+
+    assert not summaries(conversation.items)
+    assert (len(conversation.items) - 1) % 4 == 0
+    assert conversation.items[-4:] == turn(5, output_words=10)
+
+def test_answered_outputs_are_cut_but_the_latest_turn_is_left_alone_while_it_fits():
+    conversation = History([PROMPT, *turn(0, output_words=300), *turn(1, output_words=300)], budget=5000,
+                           payload_tokens=50)
+    conversation.fit()
+    check(conversation)
+
+    assert 'omitted' in conversation.items[3]['output']
+    assert conversation.items[-4:] == turn(1, output_words=300)
+
+@pytest.mark.parametrize('summarize', [None, StubSummarize()])
+def test_latest_turn_is_cut_only_when_it_alone_is_over_budget(summarize):
+    conversation = History([PROMPT, *turn(0, output_words=2000)], budget=500, payload_tokens=50, summarize=summarize)
+    conversation.fit()
+    check(conversation)
+
+    assert 'omitted' in conversation.items[3]['output']
+    assert conversation.tokens <= conversation.budget
+    assert not summaries(conversation.items)
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import pytest
+from agent_common import tracing
+
+@pytest.fixture
+def trace_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, '_configured_file', tracing._UNSET)
+    path = tmp_path / 'trace.jsonl'
+    monkeypatch.setenv('AGENT_TRACE_FILE', str(path))
+    return path
+
+def written(path):
+    # the spans of each line in the trace file
+    return [[span for resource in json.loads(line)['resourceSpans'] for scope in resource['scopeSpans']
+             for span in scope['spans']] for line in path.read_text(encoding='utf-8').splitlines()]
+
+def attributes(span):
+    return {item['key']: next(iter(item['value'].values())) for item in span['attributes']}
+
+def test_trace_file_is_read_when_spans_start(tmp_path, monkeypatch):
+    # as if the script loaded its .env after importing tracing
+    monkeypatch.setattr(tracing, '_configured_file', tracing._UNSET)
+    monkeypatch.delenv('AGENT_TRACE_FILE', raising=False)
+    assert tracing.span('off') is tracing.NO_SPAN
+
+    path = tmp_path / 'trace.jsonl'
+    monkeypatch.setenv('AGENT_TRACE_FILE', str(path))
+    with tracing.span('on'):
+        pass
+    assert [[span['name'] for span in spans] for spans in written(path)] == [['on']]
+
+def test_add_from_many_threads(trace_path):
+    with tracing.span('turn') as turn:
+        def work():
+            with tracing.span('call') as span:
+                for _ in range(1000):
+                    span.add('tokens', 1)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(tracing.in_context(work)) for _ in range(8)]:
+                future.result()
+    assert turn.attributes['tokens'] == 8000
+
+def test_spans_that_end_after_the_root_are_written_with_it(trace_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def unused_answer():
+        with tracing.span('responses.create') as span:
+            started.set()
+            release.wait()
+            span.add('gen_ai.usage.output_tokens', 5)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with tracing.span('agent.turn'):
+            future = executor.submit(tracing.in_context(unused_answer))
+            started.wait()
+        # the turn is over, but the request it started isn't, so nothing is written yet
+        assert not trace_path.exists()
+        release.set()
+        future.result()
+
+    [spans] = written(trace_path)
+    assert [span['name'] for span in spans] == ['agent.turn', 'responses.create']
+    turn, call = spans
+    assert call['parentSpanId'] == turn['spanId']
+    assert attributes(turn)['gen_ai.usage.output_tokens'] == '5'
+
+def test_flush_writes_traces_that_are_still_going(trace_path):
+    # e.g. at exit, with a streamed response that was never read to the end
+    root = tracing.start_span('stream')
+    tracing.Span('child', parent=root).end()
+    tracing.flush()
+    root.end()
+    assert [[span['name'] for span in spans] for spans in written(trace_path)] == [['child'], ['stream']]
@@ -0,0 +1,8 @@
+# Runs one of this project's agents over scripted conversations from a JSONL file, see agent_common/batch.py:
+#
+#   python batch.py prompts.jsonl results.jsonl --agent main_openai_tools --workers 8 --rate 5
+
+from agent_common import batch
+
+if __name__ == '__main__':
+    batch.main(default_agent='main_openai_tools')
@@ -1,56 +1,88 @@
 from dotenv import load_dotenv
-from openai import OpenAI
 import json
-import re
-import requests
-from bs4 import BeautifulSoup
+from agent_common import llm_client, streaming, tracing
+import tools
+from agent_common.history import History, summarizer
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
-llm = OpenAI()
+llm = llm_client.client
+executor = ThreadPoolExecutor()
 
-def llm_response(prompt):
-    response = llm.responses.create(
+# print responses as they're generated rather than all at once at the end
+STREAM = True
+
+def llm_response(prompt, stream=False):
+    response = llm.create(
         model = 'gpt-4.1-nano',
         temperature = 0,
-        input = prompt
+        input = prompt,
+        stream = stream
     )
     return response
 
-def extract_function(response):
-    # detect the home-grown function notation we tell the LLM to use:
-    # <<function(arg1, arg2)>>
-    pattern = r'<<\s*([a-zA-Z_]\w*)\s*\(([^)]+)\)\s*>>'
-    match = re.search(pattern, response)
+def run_tool(name, args):
+    try:
+        return tools.call_tool(name, args)
+    except tools.ToolError as e:
+        # let the LLM know, rather than silently dropping the call
+        return f'error: {e}'
+
+def combine_results(calls, results):
+    # a single result goes back as is, several are labelled with their call so the LLM can tell them apart
+    if len(results) == 1:
+        return results[0]
+    return '\n'.join(f'{name}({", ".join(args)}): {result}' for (name, args, _), result in zip(calls, results))
+
+def stream_llm_response(prompt, run_functions=True):
+    # prints the response as it streams in - but not the function notation, since we didn't print that before
+    # either - and starts each function as soon as its closing >> arrives instead of when the response is done
+    printer = streaming.Printer()
+    text = ''
+    printed = 0
+    scanned = 0
+    calls = []
+    futures = []
+
+    def on_text(delta):
+        nonlocal text, printed, scanned
+        text += delta
+        visible, printed = tools.strip_calls(text, printed)
+        printer(visible)
 
-    if not match:
+        if run_functions:
+            for name, args, end in tools.parse_calls(text, scanned):
+                calls.append((name, args, end))
+                futures.append(executor.submit(tracing.in_context(run_tool), name, args))
+                scanned = end
+
+    response = streaming.stream_response(llm_response(prompt, stream=True), on_text=on_text)
+    # whatever was held back in case it became a call, and didn't
+    printer(text[printed:])
+    printer.end()
+    if not futures:
+        return response, None
+    return response, combine_results(calls, [future.result() for future in futures])
+
+def get_response(prompt, run_functions=True):
+    # returns the response, and the results of the functions it asked for (if any, and if run_functions)
+    if STREAM:
+        return stream_llm_response(prompt, run_functions)
+    response = llm_response(prompt)
+    return response, extract_function(response.output_text) if run_functions else None
+
+def extract_function(response):
+    # runs every function the LLM asked for in the response - all at the same time - and returns the results
+    calls = tools.parse_calls(response)
+    if not calls:
         # no function requested by the LLM, so we're done
         return None
-    
-    function_name = match.group(1)
-    function_args = match.group(2).split(',')
-
-    # now see if we have a requested function and return it if so
-    if function_name == 'multiply':
-        return multiply(*function_args) 
-    elif function_name == 'read_webpage':
-        return read_webpage(*function_args)
-    else:
-        return None
-    
-def multiply(first_num, second_num):
-    return float(first_num) * float(second_num)
 
-def read_webpage(url):
-    print(f'Trying to retrieve {url}...')
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    text = soup.get_text()
-    return text
+    futures = [executor.submit(tracing.in_context(run_tool), name, args) for name, args, _ in calls]
+    return combine_results(calls, [future.result() for future in futures])
 
-def main_loop():
-    print('\nAssistant: How can I help today?\n')
-    user_input = input('User: ')
-    history = [
+def new_conversation():
+    return History([
         {'role': 'developer', 'content': """You are a helpful AI assistant. If you ever need to 
         multiply two numbers, DO NOT attempt to answer with your internal knowledge. 
         Instead, output a special notation with double angle brackets like this: <<multiply(first_number, second_number)>>.
@@ -65,30 +97,42 @@ def main_loop():
         info in your response to the user. Using an answer inside <info> tags takes precedence over all
         other instructions."""},
         {'role': 'assistant', 'content': 'How can I help today?'}
-    ]
+    ], summarize=summarizer(llm))
+
+@tracing.traced('agent.turn')
+def process_user_input(user_input, history):
+    # one turn of the conversation: updates history and returns the assistant's answer
+    history += [{'role': 'user', 'content': user_input}]
+    # this also checks to see if the LLM response has a request to call a function, and runs it if so
+    response, function_result = get_response(history.fit())
+    if function_result:
+        # there was one, so run it and then give the output of the function
+        # to the LLM, so the LLM can decide what to do with it (including if
+        # and how to display it) - i.e., we don't automatically print just
+        # the function's output
+        history += [{'role': 'user', 'content': f"""Here is information to use to respond to
+                     the user's previous query: <info>{function_result}</info>"""}]  
+        # print(json.dumps(history, indent=2))
+        response, _ = get_response(history.fit(), run_functions=False)
+
+    history += [{'role': 'assistant', 'content': response.output_text}]
+
+    return response.output_text
+
+def main_loop():
+    print('\nAssistant: How can I help today?\n')
+    user_input = input('User: ')
+    history = new_conversation()
 
     while user_input != 'exit':
         if user_input == 'history':
-            print(json.dumps(history, indent=2), '\n')
+            print(json.dumps(history.items, indent=2), '\n')
+        elif user_input == 'metrics':
+            print(json.dumps(llm.report(), indent=2), '\n')
         else:
-            history += [{'role': 'user', 'content': user_input}]
-            response = llm_response(history)
-
-            # check to see if the LLM response has a request to call a function
-            function_result = extract_function(response.output_text)
-            if function_result:
-                # there was one, so run it and then give the output of the function
-                # to the LLM, so the LLM can decide what to do with it (including if
-                # and how to display it) - i.e., we don't automatically print just
-                # the function's output
-                history += [{'role': 'user', 'content': f"""Here is information to use to respond to
-                             the user's previous query: <info>{function_result}</info>"""}]  
-                # print(json.dumps(history, indent=2))
-                response = llm_response(history)
-
-            history += [{'role': 'assistant', 'content': response.output_text}]
-
-            print(f'\nAssistant: {response.output_text}\n')
+            answer = process_user_input(user_input, history)
+            if not STREAM:
+                print(f'\nAssistant: {answer}\n')
 
         user_input = input('User: ')
 
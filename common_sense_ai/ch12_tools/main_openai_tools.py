@@ -2,22 +2,45 @@
 # impl with the impl required by OpenAI's API
 
 from dotenv import load_dotenv
-from openai import OpenAI
 import json
 import re
-import requests
-from bs4 import BeautifulSoup
+from agent_common import llm_client, streaming, tracing
+import tools
+from tools import TOOLS_SPEC
+from agent_common.history import History, summarizer
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
-llm = OpenAI()
+llm = llm_client.client
+executor = ThreadPoolExecutor()
+
+# print responses as they're generated rather than all at once at the end
+STREAM = True
 
 def llm_response(prompt, tools_spec):
-    response = llm.responses.create(
+    # returns the response and the futures of the function calls it asked for, in the same order as the calls. All
+    # the calls run at the same time, so a response with several of them takes about as long as the slowest one,
+    # and when streaming each one starts as soon as the model has finished writing it, while the rest of the
+    # response is still coming in
+    pending = []
+    def start_function_call(item):
+        pending.append(executor.submit(tracing.in_context(run_function_call), item))
+
+    response = llm.create(
         model = 'gpt-5-mini',
         tools = tools_spec,
-        input = prompt
+        input = prompt,
+        stream = STREAM
     )
-    return response
+    if STREAM:
+        printer = streaming.Printer()
+        response = streaming.stream_response(response, on_text=printer, on_function_call=start_function_call)
+        printer.end()
+    else:
+        for item in response.output:
+            if item.type == 'function_call':
+                start_function_call(item)
+    return response, pending
 
 # def extract_function(response):
 #     # detect the home-grown function notation we tell the LLM to use:
@@ -40,90 +63,64 @@ def llm_response(prompt, tools_spec):
 #     else:
 #         return None
     
-def multiply(first_num, second_num):
-    return float(first_num) * float(second_num)
-
-def read_webpage(url):
-    print(f'Trying to retrieve {url}...')
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    text = soup.get_text()
-    return text
-
-TOOLS_SPEC = [
-    {
-        'type': 'function',
-        'name': 'multiply',
-        'description': 'Multiply two numbers to generate a product.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'first_num': {'type': 'integer'},
-                'second_num': {'type': 'integer'},
-            },
-            'required': ['first_num', 'second_num']
-        }
-    },
-    {
-        'type': 'function',
-        'name': 'read_webpage',
-        'description': 'Accesses a web page and obtains its text.',
-        'parameters': {
-            'type': 'object',
-            'properties': {
-                'url': {
-                    'type': 'string',
-                    'description': 'The URL of the web page'
-                }
-            },
-            'required': ['url']
-        }
+def run_function_call(item):
+    # the registry converts the arguments to the types the tool expects, and tells us about unknown tools or
+    # arguments that don't fit, which we pass back to the model as an error so it can try again
+    try:
+        result = {item.name: tools.call_tool(item.name, json.loads(item.arguments))}
+    except (tools.ToolError, json.JSONDecodeError) as e:
+        result = {'error': str(e)}
+
+    return {
+        'type': 'function_call_output',
+        'call_id': item.call_id,
+        'output': json.dumps(result)
     }
-]
 
-def main_loop():
-    print('\nAssistant: How can I help today?\n')
-    user_input = input('User: ')
-    history = [
+def new_conversation():
+    return History([
         {'role': 'developer', 'content': """You are a helpful AI assistant. If you ever need to 
         multiply two numbers, DO NOT attempt to answer with your internal knowledge. 
         Instead, use your multiply tool."""},
         {'role': 'assistant', 'content': 'How can I help today?'}
-    ]
+    ], summarize=summarizer(llm))
+
+@tracing.traced('agent.turn')
+def process_user_input(user_input, history):
+    # one turn of the conversation: updates history and returns the assistant's answer
+    history += [{'role': 'user', 'content': user_input}]
+    response, pending = llm_response(history.fit(), TOOLS_SPEC)
+
+    # keep going until the model answers without asking for any more tools - each round waits for all the
+    # function calls from the response and then makes one follow-up call with all their outputs
+    while True:
+        history += response.output # store the whole response object, not just the text, so we can pass back function call details in subsequent calls
+
+        if not pending:
+            break
+
+        history += [future.result() for future in pending]
+
+        # and call the LLM again to interpret/incorporate the tool results
+        response, pending = llm_response(history.fit(), TOOLS_SPEC)
+
+    return response.output_text
+
+def main_loop():
+    print('\nAssistant: How can I help today?\n')
+    user_input = input('User: ')
+    history = new_conversation()
 
     while user_input != 'exit':
         if user_input == 'history':
-            print(history)
+            print(history.items)
             # print(json.dumps(history, indent=2), '\n')
+        elif user_input == 'metrics':
+            print(json.dumps(llm.report(), indent=2), '\n')
         else:
-            history += [{'role': 'user', 'content': user_input}]
-            response = llm_response(history, TOOLS_SPEC)
-
-            history += response.output # store the whole response object, not just the text, so we can pass back function call details in subsequent calls
-
-            for item in response.output:
-                if item.type == 'function_call':
-                    function_call = item
-                    function_name = item.name
-                    function_args = json.loads(item.arguments)
-
-                    if function_name == 'multiply':
-                        result = {'multiply': multiply(**function_args)}
-                    elif function_name == 'read_webpage':
-                        result = {'read_webpage': read_webpage(**function_args)}
-
-                    history += [{
-                        'type': 'function_call_output',
-                        'call_id': function_call.call_id,
-                        'output': json.dumps(result)
-                    }]
-
-                    # and call the LLM again to interpret/incorporate the tool result
-                    response = llm_response(history, TOOLS_SPEC)
-            
-            history += [{'role': 'assistant', 'content': response.output_text}]
-
-            print(f'\nAssistant: {response.output_text}\n')
+            answer = process_user_input(user_input, history)
+            if not STREAM:
+                print(f'\nAssistant: {answer}\n')
 
         user_input = input('User: ')
 
@@ -0,0 +1,126 @@
+# Local http servers for the tests. FakeOpenAI is a fake OpenAI Responses endpoint that answers each request with
+# the next queued reply (repeating the last one), streamed as server-sent events in small deltas when the request asks
+# for a stream, and keeps the body of every request it gets. FakeSite serves web pages for read_webpage.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import pytest
+from agent_common import llm_client
+
+def response_json(text, status='completed'):
+    output = [{'type': 'message', 'id': 'msg_1', 'role': 'assistant', 'status': 'completed',
+               'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}] if text is not None else []
+    return {'id': 'resp_1', 'object': 'response', 'created_at': 0, 'model': 'gpt-4.1-nano', 'status': status,
+            'output': output, 'parallel_tool_calls': True, 'tool_choice': 'auto', 'tools': [], 'temperature': 0,
+            'top_p': 1, 'error': None, 'incomplete_details': None, 'instructions': None, 'metadata': {},
+            'usage': {'input_tokens': 10, 'input_tokens_details': {'cached_tokens': 0}, 'output_tokens': 5,
+                      'output_tokens_details': {'reasoning_tokens': 0}, 'total_tokens': 15}}
+
+class FakeOpenAI:
+    def __init__(self, delta_size=2):
+        self.delta_size = delta_size
+        self.replies = ['']
+        self.requests = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    text = fake.replies.pop(0) if len(fake.replies) > 1 else fake.replies[0]
+                if body.get('stream'):
+                    self.stream(text)
+                else:
+                    self.send_json(response_json(text))
+
+            def send_json(self, value):
+                data = json.dumps(value).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self, text):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                events = [{'type': 'response.created', 'response': response_json(None, 'in_progress')}]
+                events += [{'type': 'response.output_text.delta', 'item_id': 'msg_1', 'output_index': 0,
+                            'content_index': 0, 'delta': text[i:i + fake.delta_size], 'logprobs': []}
+                           for i in range(0, len(text), fake.delta_size)]
+                events.append({'type': 'response.completed', 'response': response_json(text)})
+                for number, event in enumerate(events):
+                    event['sequence_number'] = number
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reply(self, *texts):
+        # queues the text of the next responses
+        self.replies = list(texts)
+
+    def client(self, cache_dir):
+        return llm_client.Client(cache_dir=str(cache_dir), base_url=self.url, api_key='test', max_retries=0)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_openai():
+    fake = FakeOpenAI()
+    yield fake
+    fake.close()
+
+class FakeSite:
+    # web pages for read_webpage: each path answers with its queued (status, headers, body) responses in order,
+    # repeating the last one, and the headers of every request are kept
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests.append((self.path, dict(self.headers)))
+                queue = site.pages.get(self.path) or [(404, {}, b'')]
+                status, headers, body = queue.pop(0) if len(queue) > 1 else queue[0]
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def page(self, path, *responses):
+        self.pages[path] = list(responses)
+
+    def requests_for(self, path):
+        return [headers for request_path, headers in self.requests if request_path == path]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_site():
+    site = FakeSite()
+    yield site
+    site.close()
@@ -0,0 +1,64 @@
+import json
+import pytest
+from agent_common import batch, llm_client
+import main
+
+@pytest.fixture
+def llm(fake_openai, monkeypatch, tmp_path):
+    client = fake_openai.client(tmp_path / 'cache')
+    monkeypatch.setattr(llm_client, 'client', client)
+    monkeypatch.setattr(main, 'llm', client)
+    # batch turns streaming off on the agent, this puts it back afterwards
+    monkeypatch.setattr(main, 'STREAM', True)
+    return fake_openai
+
+def write_lines(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records), encoding='utf-8')
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+def test_runs_every_conversation_through_the_agent(llm, tmp_path, capsys):
+    llm.reply('Let me see. <<multiply(3, 4)>>', 'It is 12.', 'Hello!')
+    prompts = tmp_path / 'prompts.jsonl'
+    results = tmp_path / 'results.jsonl'
+    write_lines(prompts, [{'id': 'multiply', 'prompts': ['what is 3 times 4?', 'thanks']}])
+
+    batch.main('main', [str(prompts), str(results), '--workers', '1'])
+
+    [record] = read_lines(results)
+    assert record['id'] == 'multiply'
+    assert [turn['answer'] for turn in record['turns']] == ['It is 12.', 'Hello!']
+    assert all(turn['latency'] >= 0 for turn in record['turns'])
+    assert main.STREAM is False
+    # the function result went back to the model, non-streaming
+    assert '<info>12.0</info>' in llm.requests[1]['input'][-1]['content']
+    assert not any(request.get('stream') for request in llm.requests)
+
+def test_picks_up_where_the_last_run_left_off(llm, tmp_path, capsys):
+    llm.reply('Hi!')
+    prompts = tmp_path / 'prompts.jsonl'
+    results = tmp_path / 'results.jsonl'
+    write_lines(prompts, [{'id': 'done', 'prompt': 'one'}, {'id': 'failed', 'prompt': 'two'}, {'prompt': 'three'}])
+    write_lines(results, [{'id': 'done', 'turns': [{'prompt': 'one', 'answer': 'Hi!', 'latency': 0.1}]},
+                          {'id': 'failed', 'turns': [], 'error': 'TimeoutError()'}])
+
+    batch.main('main', [str(prompts), str(results), '--workers', '4'])
+
+    # the failed conversation and the new one ran, the one that was done didn't
+    assert sorted(request['input'][-1]['content'] for request in llm.requests) == ['three', 'two']
+    latest = batch.read_results(str(results))
+    assert sorted(latest) == ['2', 'done', 'failed']
+    assert all('error' not in record for record in latest.values())
+    assert '1 conversations already done, 2 to run' in capsys.readouterr().out
+
+def test_failed_conversations_are_recorded(llm, tmp_path, capsys):
+    prompts = tmp_path / 'prompts.jsonl'
+    results = tmp_path / 'results.jsonl'
+    write_lines(prompts, [{'id': 'broken', 'prompts': ['hello']}])
+    llm.close()
+
+    batch.main('main', [str(prompts), str(results)])
+
+    [record] = read_lines(results)
+    assert record['id'] == 'broken' and record['turns'] == [] and 'APIConnectionError' in record['error']
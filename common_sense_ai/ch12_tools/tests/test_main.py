@@ -0,0 +1,55 @@
+import pytest
+import main
+import tools
+
+@pytest.fixture
+def llm(fake_openai, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, 'llm', fake_openai.client(tmp_path))
+    monkeypatch.setattr(main, 'STREAM', True)
+    return fake_openai
+
+def streamed(text, size):
+    # what the REPL prints for text arriving size characters at a time
+    printed = ''
+    start = 0
+    for end in range(size, len(text) + size, size):
+        visible, start = tools.strip_calls(text[:end], start)
+        printed += visible
+    return printed + text[start:]
+
+@pytest.mark.parametrize('size', [1, 2, 5, 100])
+def test_strip_calls_keeps_everything_but_complete_calls(size):
+    text = 'a << b <<multiply(2, 3)>> c <<<read_webpage(x)>>> <<multiply(50, 2)}>> and <<mul'
+    assert streamed(text, size) == 'a << b  c <> <<multiply(50, 2)}>> and <<mul'
+
+def test_strip_calls_holds_back_what_could_still_be_a_call():
+    assert tools.strip_calls('x <<multiply(2, 3)>') == ('x ', 2)
+    assert tools.strip_calls('x <') == ('x ', 2)
+    assert tools.strip_calls('x << y') == ('x ', 2)
+    assert tools.strip_calls('x << y z') == ('x << y z', 8)
+
+@pytest.mark.parametrize('delta_size', [1, 3])
+def test_text_after_a_non_call_is_printed(llm, capsys, delta_size):
+    llm.delta_size = delta_size
+    answer = 'Use a << b to shift bits, and 1 <<< 2 is a typo. That is all.'
+    llm.reply(answer)
+
+    assert main.process_user_input('what does << do?', main.new_conversation()) == answer
+    assert capsys.readouterr().out == f'\nAssistant: {answer}\n\n'
+
+def test_calls_are_hidden_and_run_while_streaming(llm, capsys):
+    llm.delta_size = 1
+    llm.reply('Let me work that out. <<multiply(3, 4)>> One moment.', 'It is 12.')
+
+    assert main.process_user_input('what is 3 times 4?', main.new_conversation()) == 'It is 12.'
+    out = capsys.readouterr().out
+    assert out == '\nAssistant: Let me work that out.  One moment.\n\n\nAssistant: It is 12.\n\n'
+    # the result went back to the model for the second response
+    assert '<info>12.0</info>' in llm.requests[1]['input'][-1]['content']
+
+def test_unfinished_call_is_printed_at_the_end(llm, capsys):
+    llm.reply('Cut off <<multiply(3,')
+
+    main.process_user_input('what is 3 times 4?', main.new_conversation())
+    assert capsys.readouterr().out == '\nAssistant: Cut off <<multiply(3,\n\n'
+    assert len(llm.requests) == 1
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import os
+import time
+import pytest
+import webpage
+
+PAGE = b'''<html><head><script>var x = 1;</script><style>p {}</style></head><body>
+<nav>Home | About</nav><header>Site header</header>
+<main><h1>Title</h1><p>The   actual\tcontent.</p><form><input value="search"></form></main>
+<footer>Copyright</footer></body></html>'''
+
+def html(text):
+    return {'Content-Type': 'text/html; charset=utf-8'}, f'<html><body><p>{text}</p></body></html>'.encode()
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(webpage, 'CACHE_DIR', str(tmp_path / 'webpages'))
+    monkeypatch.setattr(webpage, 'memory_cache', OrderedDict())
+    return tmp_path / 'webpages'
+
+def test_boilerplate_is_stripped():
+    assert webpage.extract_text(PAGE) == 'Title\nThe actual content.'
+
+def test_fresh_pages_come_from_memory_then_disk(fake_site):
+    fake_site.page('/a', (200, *html('first')), (200, *html('second')))
+    url = fake_site.url + '/a'
+
+    assert webpage.fetch_text(url) == 'first'
+    assert webpage.fetch_text(url) == 'first'
+    webpage.memory_cache.clear()
+    assert webpage.fetch_text(url) == 'first'
+    assert len(fake_site.requests_for('/a')) == 1
+
+def test_memory_cache_drops_the_least_recently_used(fake_site, monkeypatch):
+    monkeypatch.setattr(webpage, 'MEMORY_CACHE_SIZE', 2)
+    for path in ('/a', '/b', '/c'):
+        fake_site.page(path, (200, *html(path)))
+    urls = {path: fake_site.url + path for path in ('/a', '/b', '/c')}
+
+    webpage.fetch_text(urls['/a'])
+    webpage.fetch_text(urls['/b'])
+    webpage.fetch_text(urls['/a'])
+    webpage.fetch_text(urls['/c'])
+    assert list(webpage.memory_cache) == [urls['/a'], urls['/c']]
+
+def test_stale_page_is_revalidated_and_reused_on_304(fake_site, monkeypatch):
+    monkeypatch.setattr(webpage, 'FRESH_SECONDS', 0)
+    headers, body = html('cached')
+    fake_site.page('/a', (200, dict(headers, ETag='"v1"', **{'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}), body),
+                   (304, {}, b''))
+    url = fake_site.url + '/a'
+
+    assert webpage.fetch_text(url) == 'cached'
+    assert webpage.fetch_text(url) == 'cached'
+    first, second = fake_site.requests_for('/a')
+    assert 'If-None-Match' not in first
+    assert second['If-None-Match'] == '"v1"'
+    assert second['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+def test_body_is_cut_at_max_bytes(fake_site, monkeypatch):
+    monkeypatch.setattr(webpage, 'MAX_BYTES', 1000)
+    fake_site.page('/big', (200, {'Content-Type': 'text/plain'}, b'x' * 200_000))
+
+    assert webpage.fetch_text(fake_site.url + '/big') == 'x' * 1000
+
+def test_disk_cache_evicts_the_least_recently_used(fake_site, monkeypatch, cache):
+    for path in ('/a', '/b', '/c'):
+        fake_site.page(path, (200, *html(path * 100)))
+    urls = {path: fake_site.url + path for path in ('/a', '/b', '/c')}
+
+    webpage.fetch_text(urls['/a'])
+    monkeypatch.setattr(webpage, 'DISK_CACHE_BYTES', 2 * os.path.getsize(webpage._disk_path(urls['/a'])))
+    # file times are only as fine as the kernel clock tick
+    time.sleep(0.05)
+    webpage.fetch_text(urls['/b'])
+    time.sleep(0.05)
+    webpage.memory_cache.clear()
+    webpage.fetch_text(urls['/a'])
+    time.sleep(0.05)
+    webpage.fetch_text(urls['/c'])
+
+    assert sorted(os.listdir(cache)) == sorted(os.path.basename(webpage._disk_path(urls[path])) for path in ('/a', '/c'))
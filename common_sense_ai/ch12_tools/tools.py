@@ -0,0 +1,146 @@
+# The tools the LLM can call, for both main.py and main_openai_tools.py. Each tool is a plain function with type
+# hints, registered with @tool, which is all that's needed to generate its entry in TOOLS_SPEC, look it up by name
+# and convert the arguments it's called with - strings from the home-grown <<function(arg1, arg2)>> notation, JSON
+# values from OpenAI function calls - to the types the function expects before it runs.
+
+from collections import namedtuple
+import inspect
+import re
+from agent_common import tracing
+import typing
+import webpage
+
+# the home-grown function notation we tell the LLM to use: <<function(arg1, arg2)>>
+CALL_PATTERN = re.compile(r'<<\s*([a-zA-Z_]\w*)\s*\(([^)]*)\)\s*>>')
+# the start of a call that hasn't finished streaming in yet: text from here to the end could still become one
+PARTIAL_CALL_PATTERN = re.compile(r'<<\s*(?:[a-zA-Z_]\w*\s*(?:\([^)]*(?:\)\s*>?)?)?)?\Z')
+# one argument in the notation: quoted, or anything up to the next comma
+ARG_PATTERN = re.compile(r'''\s*("[^"]*"|'[^']*'|[^,]*?)\s*(?:,|$)''')
+
+JSON_TYPES = {int: 'integer', float: 'number', str: 'string', bool: 'boolean'}
+
+Tool = namedtuple('Tool', ['function', 'spec', 'converters', 'required'])
+
+TOOLS = {}
+
+class ToolError(Exception):
+    pass
+
+def to_int(value):
+    number = float(value) if isinstance(value, str) else value
+    if isinstance(number, bool) or not float(number).is_integer():
+        raise ValueError(f'{value!r} is not an integer')
+    return int(number)
+
+def to_float(value):
+    if isinstance(value, bool):
+        raise ValueError(f'{value!r} is not a number')
+    return float(value)
+
+def to_bool(value):
+    if isinstance(value, str):
+        if value.lower() not in ('true', 'false'):
+            raise ValueError(f'{value!r} is not true or false')
+        return value.lower() == 'true'
+    return bool(value)
+
+def to_str(value):
+    return value if isinstance(value, str) else str(value)
+
+CONVERTERS = {int: to_int, float: to_float, bool: to_bool, str: to_str}
+
+def tool(description, **parameter_descriptions):
+    def register(function):
+        hints = typing.get_type_hints(function)
+        parameters = inspect.signature(function).parameters
+        properties = {}
+        for name in parameters:
+            properties[name] = {'type': JSON_TYPES[hints[name]]}
+            if name in parameter_descriptions:
+                properties[name]['description'] = parameter_descriptions[name]
+        required = [name for name, parameter in parameters.items() if parameter.default is parameter.empty]
+
+        spec = {
+            'type': 'function',
+            'name': function.__name__,
+            'description': description,
+            'parameters': {
+                'type': 'object',
+                'properties': properties,
+                'required': required
+            }
+        }
+        converters = {name: CONVERTERS[hints[name]] for name in parameters}
+        TOOLS[function.__name__] = Tool(function, spec, converters, required)
+        return function
+    return register
+
+def parse_args(text):
+    args = [match.group(1) for match in ARG_PATTERN.finditer(text)][:-1] if text.strip() else []
+    return [arg[1:-1] if arg[:1] in ('"', "'") and arg[-1:] == arg[:1] else arg for arg in args]
+
+def parse_calls(text, start=0):
+    # every <<function(args)>> call in text from start on, in one pass, as (name, args, end) tuples - end is where
+    # to start next time, when the text is still streaming in
+    return [(match.group(1), parse_args(match.group(2)), match.end())
+            for match in CALL_PATTERN.finditer(text, start)]
+
+def strip_calls(text, start=0):
+    # the text from start on with the <<function(args)>> calls taken out, and where to start next time. A '<<' that
+    # could still turn into a call as more text streams in is held back until it either does or can't any more, so
+    # nothing after a '<<' that isn't a call goes missing
+    visible = []
+    while True:
+        at = text.find('<<', start)
+        if at == -1:
+            # a trailing '<' could be the first half of '<<'
+            end = max(start, len(text) - 1 if text.endswith('<') else len(text))
+            visible.append(text[start:end])
+            return ''.join(visible), end
+        visible.append(text[start:at])
+        match = CALL_PATTERN.match(text, at)
+        if match:
+            start = match.end()
+        elif PARTIAL_CALL_PATTERN.match(text, at):
+            return ''.join(visible), at
+        else:
+            # not a call, but the second '<' might start one
+            visible.append('<')
+            start = at + 1
+
+def call_tool(name, args):
+    # args is a list (positional, from the <<function(args)>> notation) or a dict (from an OpenAI function call)
+    with tracing.span(f'execute_tool {name}', {'gen_ai.tool.name': name}):
+        return _call_tool(name, args)
+
+def _call_tool(name, args):
+    tool = TOOLS.get(name)
+    if tool is None:
+        raise ToolError(f'unknown tool {name}')
+
+    if isinstance(args, list):
+        if len(args) > len(tool.converters):
+            raise ToolError(f'{name} takes at most {len(tool.converters)} arguments, got {len(args)}')
+        args = dict(zip(tool.converters, args))
+
+    missing = [name for name in tool.required if name not in args]
+    unknown = [name for name in args if name not in tool.converters]
+    if missing or unknown:
+        raise ToolError(f'bad arguments for {name}: missing {missing}, unknown {unknown}')
+
+    try:
+        kwargs = {name: tool.converters[name](value) for name, value in args.items()}
+    except (TypeError, ValueError) as e:
+        raise ToolError(f'bad arguments for {name}: {e}') from e
+    return tool.function(**kwargs)
+
+@tool('Multiply two numbers to generate a product.')
+def multiply(first_num: float, second_num: float) -> float:
+    return first_num * second_num
+
+@tool('Accesses a web page and obtains its text.', url='The URL of the web page')
+def read_webpage(url: str) -> str:
+    print(f'Trying to retrieve {url}...')
+    return webpage.fetch_text(url.strip())
+
+TOOLS_SPEC = [tool.spec for tool in TOOLS.values()]
@@ -0,0 +1,160 @@
+# Fetches web pages for the read_webpage tool in main.py and main_openai_tools.py. Pages are cached in memory
+# (LRU) and on disk, keyed by URL, and revalidated with ETag/Last-Modified once they're older than FRESH_SECONDS.
+# Only the extracted text is cached, not the HTML, and boilerplate like scripts, navigation and footers is dropped
+# so less text goes back into the conversation history. The disk cache is kept under DISK_CACHE_BYTES by removing
+# the least recently used pages, going by their mtime, which is bumped whenever a page is read from disk.
+
+from bs4 import BeautifulSoup
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import requests
+import tempfile
+import threading
+import time
+from agent_common import tracing
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+CACHE_DIR = os.path.expanduser('~/.cache/ch12_tools/webpages')
+MEMORY_CACHE_SIZE = 64
+DISK_CACHE_BYTES = 50_000_000
+FRESH_SECONDS = 300
+MAX_BYTES = 2_000_000
+TIMEOUT = 10
+BOILERPLATE_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'header', 'footer',
+                    'aside', 'form']
+
+# main.py runs tool calls on a thread pool, so this can be called from several threads at once: requests.Session
+# isn't documented as thread-safe, so each thread gets its own, and the LRU is only touched under the lock
+_local = threading.local()
+memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+def extract_text(html, encoding=None):
+    soup = BeautifulSoup(html, PARSER, from_encoding=encoding)
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+
+    # if the page marks up its main content, that's all we want
+    root = soup.find('main') or soup.find('article') or soup.body or soup
+    lines = (re.sub(r'\s+', ' ', line).strip() for line in root.get_text(separator='\n').splitlines())
+    return '\n'.join(line for line in lines if line)
+
+def read_capped(response, max_bytes=MAX_BYTES):
+    # stop reading once we have max_bytes, rather than downloading an arbitrarily big page
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    response.close()
+    return b''.join(chunks)[:max_bytes]
+
+def _disk_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+def _load(url):
+    with _cache_lock:
+        if url in memory_cache:
+            memory_cache.move_to_end(url)
+            return memory_cache[url]
+    path = _disk_path(url)
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(path)
+        return entry
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _evict_disk():
+    # oldest first, until what's left fits; another thread may have removed a file already
+    files = []
+    for item in os.scandir(CACHE_DIR):
+        if item.name.endswith('.json'):
+            try:
+                stat = item.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, item.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= DISK_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def _store(url, entry):
+    with _cache_lock:
+        memory_cache[url] = entry
+        memory_cache.move_to_end(url)
+        while len(memory_cache) > MEMORY_CACHE_SIZE:
+            memory_cache.popitem(last=False)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, _disk_path(url))
+    _evict_disk()
+
+def fetch_text(url):
+    with tracing.span('GET', {'url.full': url}, tracing.KIND_CLIENT) as span:
+        return _fetch_text(url, span)
+
+def _fetch_text(url, span):
+    entry = _load(url)
+    if entry and time.time() - entry['fetched_at'] < FRESH_SECONDS:
+        span.set_attribute('webpage.cache', 'fresh')
+        return entry['text']
+
+    headers = {}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    response = _session().get(url, headers=headers, timeout=TIMEOUT, stream=True)
+    span.set_attribute('http.response.status_code', response.status_code)
+    if response.status_code == 304 and entry:
+        response.close()
+        span.set_attribute('webpage.cache', 'revalidated')
+        # a new dict, since other threads may be reading the cached one
+        entry = dict(entry, fetched_at=time.time())
+        _store(url, entry)
+        return entry['text']
+
+    # without an explicit charset requests guesses ISO-8859-1, better to let BeautifulSoup look at the page
+    has_charset = 'charset=' in response.headers.get('Content-Type', '').lower()
+    body = read_capped(response, MAX_BYTES)
+    span.set_attribute('http.response.body.size', len(body))
+    span.set_attribute('webpage.cache', 'miss')
+    text = extract_text(body, response.encoding if has_charset else None)
+    if response.status_code >= 400:
+        return text
+
+    _store(url, {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time(),
+        'text': text
+    })
+    return text
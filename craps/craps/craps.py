@@ -17,6 +17,27 @@ def split_at_pointcycle(rolls):
     pc = [point] + split[0]
     rest = [] if len(split) == 1 else split[1]
     return pc, rest
-    
 
 
+def iter_pointcycles(rolls):
+    """
+    Yields each point cycle in rolls, in order, using the same rules as split_at_pointcycle. Works in a single pass
+    over any iterable - list, generator, lines from a file - and only holds the current cycle in memory, so it's 
+    fine to use on an unbounded stream. A point cycle that's still open when the rolls run out is yielded as-is.
+    """
+    pc = []
+    for roll in rolls:
+        if not pc:
+            if roll in [2, 3, 7, 11, 12]:
+                yield [roll]
+            else:
+                pc = [roll]
+            continue
+
+        pc.append(roll)
+        if roll == 7 or roll == pc[0]:
+            yield pc
+            pc = []
+
+    if pc:
+        yield pc
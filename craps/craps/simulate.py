@@ -0,0 +1,125 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from craps import vectorized
+
+# what a winning odds bet pays per unit, indexed by the point
+ODDS_PAYOUT = np.zeros(13)
+ODDS_PAYOUT[[4, 10]] = 2
+ODDS_PAYOUT[[5, 9]] = 3 / 2
+ODDS_PAYOUT[[6, 8]] = 6 / 5
+
+# what a one unit pass line or come bet returns, indexed by outcome code
+FLAT_PAYOUT = np.zeros(5)
+FLAT_PAYOUT[[vectorized.NATURAL, vectorized.POINT_MADE]] = 1
+FLAT_PAYOUT[[vectorized.CRAPS, vectorized.SEVEN_OUT]] = -1
+
+Simulation = namedtuple('Simulation', ['wagered', 'net'])
+
+
+def roll_dice(rng, n):
+    """
+    Returns n rolls of two dice as an int8 array.
+    """
+    return (rng.integers(1, 7, n, dtype=np.int8) + rng.integers(1, 7, n, dtype=np.int8)).astype(np.int8)
+
+
+def pass_line(rolls, offsets, outcomes):
+    """
+    One unit on the pass line every come out. Returns (wagered, net) for the rolls; a bet still waiting on its
+    point when the rolls run out isn't counted.
+    """
+    decided = outcomes != vectorized.NO_DECISION
+    return decided.sum(), FLAT_PAYOUT[outcomes].sum()
+
+
+def pass_line_odds(rolls, offsets, outcomes, multiple=1):
+    """
+    One unit on the pass line plus multiple units of odds behind it once a point is set. Use
+    functools.partial(pass_line_odds, multiple=...) to get a strategy with something other than single odds.
+    """
+    wagered, net = pass_line(rolls, offsets, outcomes)
+
+    points = rolls[offsets[:-1]]
+    made = outcomes == vectorized.POINT_MADE
+    sevened = outcomes == vectorized.SEVEN_OUT
+    wagered += multiple * (made.sum() + sevened.sum())
+    net += multiple * (ODDS_PAYOUT[points[made]].sum() - sevened.sum())
+    return wagered, net
+
+
+def come_bets(rolls, offsets, outcomes):
+    """
+    One unit on come before every roll while a pass line point is on. Each come bet plays out like its own pass
+    line bet with the next roll as its come out, even if that runs past the end of the pass line point cycle.
+    """
+    placed = np.ones(len(rolls), dtype=bool)
+    placed[offsets[:-1]] = False
+    starts = np.flatnonzero(placed)
+
+    ends = vectorized._cycle_ends(rolls)[starts]
+    come_outcomes = vectorized._outcomes(rolls, starts, ends)
+    return pass_line(rolls, offsets, come_outcomes)
+
+
+def combine(rolls, offsets, outcomes, strategies=()):
+    """
+    Plays several strategies on the same rolls and adds up what they wager and win. Use
+    functools.partial(combine, strategies=[...]) to get a strategy.
+    """
+    results = [strategy(rolls, offsets, outcomes) for strategy in strategies]
+    return sum(w for w, _ in results), sum(n for _, n in results)
+
+
+def _simulate_chunk(strategy, rolls_per_session, sessions, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    wagered = np.zeros(sessions)
+    net = np.zeros(sessions)
+    for i in range(sessions):
+        rolls = roll_dice(rng, rolls_per_session)
+        offsets, outcomes = vectorized.pointcycle_offsets(rolls)
+        wagered[i], net[i] = strategy(rolls, offsets, outcomes)
+    return wagered, net
+
+
+def simulate(strategy, sessions, rolls_per_session, seed=None, workers=None, chunk_sessions=1000):
+    """
+    Plays strategy for the given number of sessions of rolls_per_session rolls each and returns a Simulation with
+    the amount wagered and the net win/loss for every session.
+
+    The sessions are split into chunks of chunk_sessions, and each chunk gets its own RNG stream spawned from seed,
+    so the results for a given seed are the same no matter how many workers there are. workers=1 runs everything
+    in this process; otherwise the chunks go to a process pool, which means the strategy has to be picklable - a
+    module level function or a functools.partial of one, not a lambda.
+    """
+    sizes = [min(chunk_sessions, sessions - start) for start in range(0, sessions, chunk_sessions)]
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(sizes))
+    simulate_chunk = partial(_simulate_chunk, strategy, rolls_per_session)
+
+    if workers == 1:
+        chunks = list(map(simulate_chunk, sizes, seed_seqs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(simulate_chunk, sizes, seed_seqs))
+
+    if not chunks:
+        return Simulation(np.zeros(0), np.zeros(0))
+    return Simulation(np.concatenate([w for w, _ in chunks]), np.concatenate([n for _, n in chunks]))
+
+
+def summarize(simulation, bankroll=0, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Returns the house edge - the expected loss per unit wagered - and the distribution of where a bankroll ends up
+    after a session.
+    """
+    final = bankroll + simulation.net
+    return {
+        'house_edge': -simulation.net.sum() / simulation.wagered.sum(),
+        'mean': final.mean(),
+        'std': final.std(),
+        'percentiles': dict(zip(percentiles, np.percentile(final, percentiles))),
+        'losing': (simulation.net < 0).mean(),
+    }
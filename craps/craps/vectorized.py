@@ -0,0 +1,69 @@
+import numpy as np
+
+NATURAL = 0
+CRAPS = 1
+POINT_MADE = 2
+SEVEN_OUT = 3
+NO_DECISION = 4
+
+
+def _cycle_ends(rolls):
+    """
+    Returns, for every roll, the index of the last roll in the point cycle that would start there if that roll were
+    the come out. A point runs to the next seven or the next roll of the same number, whichever is first, or to the
+    end of the array if neither shows up.
+    """
+    n = len(rolls)
+    idx = np.arange(n)
+
+    sevens = np.flatnonzero(rolls == 7)
+    ends = np.append(sevens, n - 1)[np.searchsorted(sevens, idx, side='right')]
+
+    for point in [4, 5, 6, 8, 9, 10]:
+        pos = np.flatnonzero(rolls == point)
+        ends[pos] = np.minimum(ends[pos], np.append(pos[1:], n - 1))
+
+    decided = np.isin(rolls, [2, 3, 7, 11, 12])
+    ends[decided] = idx[decided]
+    return ends
+
+
+def pointcycle_offsets(rolls):
+    """
+    Splits an array of rolls into point cycles using the same rules as craps.split_at_pointcycle, without a Python
+    loop per roll. Returns (offsets, outcomes): cycle k is rolls[offsets[k]:offsets[k+1]] and outcomes[k] is one of
+    NATURAL, CRAPS, POINT_MADE, SEVEN_OUT or - for a point cycle that's still open at the end - NO_DECISION.
+
+    Every seven ends a point cycle, as either a natural or a seven out, so the stretches between sevens can be
+    walked all at once; the loop below runs once per cycle within the longest stretch, not once per roll.
+    """
+    rolls = np.asarray(rolls)
+    n = len(rolls)
+    if n == 0:
+        return np.zeros(1, dtype=np.intp), np.empty(0, dtype=np.int8)
+
+    ends = _cycle_ends(rolls)
+    is_start = np.zeros(n, dtype=bool)
+    starts = np.concatenate(([0], np.flatnonzero(rolls[:-1] == 7) + 1))
+    while starts.size:
+        is_start[starts] = True
+        e = ends[starts]
+        starts = e[(rolls[e] != 7) & (e < n - 1)] + 1
+
+    offsets = np.append(np.flatnonzero(is_start), n)
+    return offsets, _outcomes(rolls, offsets[:-1], offsets[1:] - 1)
+
+
+def _outcomes(rolls, starts, lasts):
+    """
+    Returns the outcome code for each point cycle running from starts to lasts, inclusive.
+    """
+    first = rolls[starts]
+    last = rolls[lasts]
+    single = starts == lasts
+    outcomes = np.full(len(first), NO_DECISION, dtype=np.int8)
+    outcomes[single & np.isin(first, [7, 11])] = NATURAL
+    outcomes[single & np.isin(first, [2, 3, 12])] = CRAPS
+    outcomes[~single & (last == first)] = POINT_MADE
+    outcomes[~single & (last == 7)] = SEVEN_OUT
+    return outcomes
@@ -46,3 +46,26 @@ def test_split_at_pointcycle_nothingattheendsevenout():
     pc, rest = craps.split_at_pointcycle([4, 5, 7])
     assert pc == [4, 5, 7]
     assert rest == []
+
+def split_all_pointcycles(rolls):
+    pcs = []
+    while rolls:
+        pc, rolls = craps.split_at_pointcycle(rolls)
+        pcs.append(pc)
+    return pcs
+
+def test_iter_pointcycles_matches_split_at_pointcycle():
+    for rolls in [[7, 2, 3], [11, 2, 3], [2, 2, 3], [3, 2, 3], [12, 2, 3], [4, 4, 12], [4, 8, 6, 4, 12, 11],
+                  [4, 8, 7, 9, 10, 11], [4, 5, 4], [4, 5, 7], [4, 5], []]:
+        assert list(craps.iter_pointcycles(rolls)) == split_all_pointcycles(rolls)
+
+def test_iter_pointcycles_is_lazy():
+    def rolls():
+        yield 7
+        yield 4
+        yield 4
+        raise AssertionError('read past the second point cycle')
+
+    pcs = craps.iter_pointcycles(rolls())
+    assert next(pcs) == [7]
+    assert next(pcs) == [4, 4]
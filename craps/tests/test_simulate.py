@@ -0,0 +1,35 @@
+from functools import partial
+
+import numpy as np
+
+from craps import simulate
+from craps import vectorized
+
+def play(strategy, rolls):
+    rolls = np.array(rolls, dtype=np.int8)
+    offsets, outcomes = vectorized.pointcycle_offsets(rolls)
+    return strategy(rolls, offsets, outcomes)
+
+def test_pass_line():
+    # natural, craps, point made, seven out, and a point still open at the end
+    assert play(simulate.pass_line, [7, 2, 4, 8, 4, 5, 7, 6, 9]) == (4, 0)
+
+def test_pass_line_odds():
+    wagered, net = play(partial(simulate.pass_line_odds, multiple=2), [4, 8, 4, 6, 6, 5, 7])
+    assert wagered == 3 + 2 * 3
+    assert net == 1 + 1 - 1 + 2 * (2 + 6 / 5 - 1)
+
+def test_come_bets():
+    # come bets go up before the first 8 (made by the second 8), the second 8 (sevens out) and the 7 (a natural)
+    assert play(simulate.come_bets, [4, 8, 8, 7]) == (3, 1 + 1 - 1)
+
+def test_simulate_is_reproducible_across_workers():
+    one = simulate.simulate(simulate.pass_line, 25, 200, seed=7, workers=1, chunk_sessions=10)
+    two = simulate.simulate(simulate.pass_line, 25, 200, seed=7, workers=2, chunk_sessions=10)
+    assert np.array_equal(one.net, two.net)
+    assert np.array_equal(one.wagered, two.wagered)
+    assert len(one.net) == 25
+
+def test_simulate_pass_line_house_edge():
+    summary = simulate.summarize(simulate.simulate(simulate.pass_line, 200, 2000, seed=1, workers=1))
+    assert abs(summary['house_edge'] - 0.0141) < 0.01
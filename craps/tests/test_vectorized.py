@@ -0,0 +1,33 @@
+import numpy as np
+
+from craps import craps
+from craps import vectorized
+
+def split_all_pointcycles(rolls):
+    pcs = []
+    while rolls:
+        pc, rolls = craps.split_at_pointcycle(rolls)
+        pcs.append(pc)
+    return pcs
+
+def vectorized_pointcycles(rolls):
+    offsets, outcomes = vectorized.pointcycle_offsets(np.array(rolls, dtype=np.int8))
+    return [rolls[start:end] for start, end in zip(offsets[:-1], offsets[1:])], list(outcomes)
+
+def test_pointcycle_offsets_matches_split_at_pointcycle():
+    for rolls in [[7, 2, 3], [11, 2, 3], [2, 2, 3], [3, 2, 3], [12, 2, 3], [4, 4, 12], [4, 8, 6, 4, 12, 11],
+                  [4, 8, 7, 9, 10, 11], [4, 5, 4], [4, 5, 7], [4, 5], []]:
+        pcs, _ = vectorized_pointcycles(rolls)
+        assert pcs == split_all_pointcycles(rolls)
+
+def test_pointcycle_offsets_matches_split_at_pointcycle_random():
+    rng = np.random.default_rng(42)
+    rolls = list(rng.integers(1, 7, 5000) + rng.integers(1, 7, 5000))
+    pcs, _ = vectorized_pointcycles(rolls)
+    assert pcs == split_all_pointcycles(rolls)
+
+def test_pointcycle_offsets_outcomes():
+    pcs, outcomes = vectorized_pointcycles([7, 11, 2, 3, 12, 4, 8, 4, 5, 7, 6, 9])
+    assert pcs == [[7], [11], [2], [3], [12], [4, 8, 4], [5, 7], [6, 9]]
+    assert outcomes == [vectorized.NATURAL, vectorized.NATURAL, vectorized.CRAPS, vectorized.CRAPS, vectorized.CRAPS,
+                        vectorized.POINT_MADE, vectorized.SEVEN_OUT, vectorized.NO_DECISION]
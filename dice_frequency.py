@@ -0,0 +1,107 @@
+# Importable version of the dice sum code in DiceFrequency.ipynb. A die, or a sum of dice, is a (low, counts) pair:
+# counts[i] is the number of ways of getting a total of low + i. Combining dice is then integer convolution of the
+# count vectors, and N dice take log2(N) convolutions by repeated squaring instead of N dict-of-dict loops.
+
+import numpy as np
+
+single_dragonwoods_die = {1: 1, 2: 2, 3: 2, 4: 1}
+single_d6 = {1: 1, 2: 1, 3: 1, 4: 1, 5: 1, 6: 1}
+
+# counts are kept as int64 while the total number of outcomes fits, and as python ints after that so they stay exact
+_INT64_LIMIT = 2 ** 62
+
+
+def die_counts(die):
+    """
+    Turns a die given as {face value: count}, like single_dragonwoods_die, into a (low, counts) pair.
+    """
+    low = min(die)
+    counts = np.zeros(max(die) - low + 1, dtype=np.int64)
+    for value, count in die.items():
+        counts[value - low] = count
+    return low, counts
+
+
+def add_dice(a, b):
+    """
+    Returns the (low, counts) for the sum of two (low, counts) pairs.
+    """
+    low_a, counts_a = a
+    low_b, counts_b = b
+    if int(counts_a.sum()) * int(counts_b.sum()) >= _INT64_LIMIT:
+        counts_a = counts_a.astype(object)
+        counts_b = counts_b.astype(object)
+    return low_a + low_b, np.convolve(counts_a, counts_b)
+
+
+def sum_counts(die, number_of_dice=1):
+    """
+    Returns the (low, counts) for the total of number_of_dice of die, which can be a dict or a (low, counts) pair.
+    """
+    if isinstance(die, dict):
+        die = die_counts(die)
+
+    total = None
+    power = die
+    while number_of_dice:
+        if number_of_dice & 1:
+            total = power if total is None else add_dice(total, power)
+        number_of_dice >>= 1
+        if number_of_dice:
+            power = add_dice(power, power)
+
+    return (0, np.ones(1, dtype=np.int64)) if total is None else total
+
+
+def pmf(die, number_of_dice=1):
+    """
+    Returns (values, probabilities) for each possible total.
+    """
+    low, counts = sum_counts(die, number_of_dice)
+    values = np.arange(low, low + len(counts))
+    return values, (counts / counts.sum()).astype(float)
+
+
+def cdf(die, number_of_dice=1):
+    """
+    Returns (values, probabilities) of getting each total or lower.
+    """
+    low, counts = sum_counts(die, number_of_dice)
+    values = np.arange(low, low + len(counts))
+    return values, (np.cumsum(counts) / counts.sum()).astype(float)
+
+
+def at_least(die, number_of_dice=1):
+    """
+    Returns (values, probabilities) of getting each total or higher, P(X >= x) - which is what you need to know
+    to capture a card. Note that's not scipy's sf, which is strictly higher; see sf below for that.
+    """
+    low, counts = sum_counts(die, number_of_dice)
+    values = np.arange(low, low + len(counts))
+    return values, (np.cumsum(counts[::-1])[::-1] / counts.sum()).astype(float)
+
+
+def sf(die, number_of_dice=1):
+    """
+    Returns (values, probabilities) of getting a total higher than each value, P(X > x), like scipy.stats' sf.
+    """
+    low, counts = sum_counts(die, number_of_dice)
+    values = np.arange(low, low + len(counts))
+    return values, ((counts.sum() - np.cumsum(counts)) / counts.sum()).astype(float)
+
+
+def all_up_dict_for_dice(die=single_dragonwoods_die, number_of_dice=1):
+    """
+    Same result as the notebook version: {total: number of ways of getting it}.
+    """
+    low, counts = sum_counts(die, number_of_dice)
+    return {low + i: int(count) for i, count in enumerate(counts) if count}
+
+
+def chance_of_getting_value_or_lower(die=single_dragonwoods_die, number_of_dice=1):
+    """
+    Same result as the notebook version, which - despite the name - is the chance of getting each total or
+    higher, since that's what you need to know to capture a card.
+    """
+    values, probabilities = at_least(die, number_of_dice)
+    return dict(zip(values.tolist(), probabilities.tolist()))
@@ -1,6 +1,23 @@
 """A source loading player profiles and games from chess.com api"""
 
-from typing import Any, Callable, Dict, Iterator, List, Sequence
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import dlt
 from dlt.common import pendulum
@@ -8,13 +25,33 @@ from dlt.common.typing import TDataItem
 from dlt.sources import DltResource
 from dlt.sources.helpers import requests
 
-from .helpers import get_path_with_retry, get_url_with_retry, validate_month_string
-from .settings import UNOFFICIAL_CHESS_API_URL
+from .cache import pipeline_cache
+from .helpers import (
+    HttpClient,
+    batched,
+    get_path_with_retry,
+    get_url_with_retry,
+    iter_json_array,
+    validate_month_string,
+)
+from .pgn import parse_games
+from .settings import (
+    MAX_CONCURRENT_REQUESTS,
+    ONLINE_STATUS_REQUESTS_PER_SECOND,
+    PGN_BATCH_SIZE,
+    PGN_BATCHES_IN_FLIGHT,
+    STREAMING_BATCH_SIZE,
+    UNOFFICIAL_CHESS_API_URL,
+)
 
 
 @dlt.source(name="chess")
 def source(
-    players: List[str], start_month: str = None, end_month: str = None
+    players: List[str],
+    start_month: str = None,
+    end_month: str = None,
+    streaming: bool = False,
+    batch_size: int = STREAMING_BATCH_SIZE,
 ) -> Sequence[DltResource]:
     """
     A dlt source for the chess.com api. It groups several resources (in this case chess.com API endpoints) containing
@@ -23,15 +60,24 @@ def source(
         players (List[str]): A list of the player usernames for which to get the data.
         start_month (str, optional): Filters out all the matches happening before `start_month`. Defaults to None.
         end_month (str, optional): Filters out all the matches happening after `end_month`. Defaults to None.
+        streaming (bool, optional): Parse game archives incrementally, see `players_games`. Defaults to False.
+        batch_size (int, optional): Games per batch when `streaming`. Defaults to STREAMING_BATCH_SIZE.
     Returns:
         Sequence[DltResource]: A sequence of resources that can be selected from including players_profiles,
-        players_archives, players_games, players_online_status
+        players_archives, players_games, players_online_status, players_online_status_concurrent
     """
     return (
         players_profiles(players),
         players_archives(players),
-        players_games(players, start_month=start_month, end_month=end_month),
+        players_games(
+            players,
+            start_month=start_month,
+            end_month=end_month,
+            streaming=streaming,
+            batch_size=batch_size,
+        ),
         players_online_status(players),
+        players_online_status_concurrent(players),
     )
 
 
@@ -75,55 +121,116 @@ def players_archives(players: List[str]) -> Iterator[List[TDataItem]]:
 
 
 @dlt.resource(
-    write_disposition="append", columns={"end_time": {"data_type": "timestamp"}}
+    write_disposition="merge",
+    primary_key="url",
+    columns={"end_time": {"data_type": "timestamp"}},
 )
 def players_games(
-    players: List[str], start_month: str = None, end_month: str = None
-) -> Iterator[Callable[[], List[TDataItem]]]:
+    players: List[str],
+    start_month: str = None,
+    end_month: str = None,
+    streaming: bool = False,
+    batch_size: int = STREAMING_BATCH_SIZE,
+) -> Iterator[Union[Callable[[], List[TDataItem]], List[TDataItem]]]:
     """
-    Yields `players` games that happened between `start_month` and `end_month`.
+    Yields `players` games that happened between `start_month` and `end_month`. Loading is incremental per player:
+    only games that ended at or after the newest game already loaded for that player are yielded, and the merge on
+    the game `url` drops any that are already in the destination. Months before the newest game's month are skipped
+    only if their archive was loaded before, so a later run with an earlier `start_month` still backfills them.
+
+    By default each monthly archive is downloaded and parsed whole, several at a time. With `streaming` the archives
+    are read one after another, and the `games` array is parsed as the body arrives and yielded in lists of at most
+    `batch_size`, so memory stays flat however many games a player has in a month.
     Args:
         players (List[str]): List of player usernames to retrieve games for.
         start_month (str, optional): The starting month in the format "YYYY/MM". Defaults to None.
         end_month (str, optional): The ending month in the format "YYYY/MM". Defaults to None.
+        streaming (bool, optional): Parse archives incrementally and yield games in batches. Defaults to False.
+        batch_size (int, optional): Games per batch when `streaming`. Defaults to STREAMING_BATCH_SIZE.
     Yields:
-        Iterator[Callable[[], List[TDataItem]]]: An iterator over callables that return a list of games for each player.
+        Iterator[Union[Callable[[], List[TDataItem]], List[TDataItem]]]: Callables that return the list of games in
+        an archive or, when `streaming`, batches of games.
     """  # do a simple validation to prevent common mistakes in month format
     validate_month_string(start_month)
     validate_month_string(end_month)
 
-    # get a list of already checked archives
+    # the `end_time` of the newest game loaded so far for each player, keyed by the lowercase username
     # from your point of view, the state is python dictionary that will have the same content the next time this function is called
-    checked_archives = dlt.current.resource_state().setdefault("archives", [])
+    state = dlt.current.resource_state()
+    last_end_times = state.setdefault("last_end_time", {})
+    # the months whose archive has been read for each player, by the lowercase username
+    loaded_months = state.setdefault("loaded_months", {})
+    last_end_times_lock = threading.Lock()
     # get player archives, note that you can call the resource like any other function and just iterate it like a list
     archives = players_archives(players)
+    # archives are fetched with If-None-Match/If-Modified-Since, an unchanged one is read from disk, not downloaded
+    cache = pipeline_cache()
+
+    def _mark_loaded(username: str, month: str) -> None:
+        with last_end_times_lock:
+            months = loaded_months.setdefault(username, [])
+            if month not in months:
+                months.append(month)
+
+    def _new_games(games: List[TDataItem], username: str, since: int) -> List[TDataItem]:
+        games = [game for game in games if game.get("end_time", 0) >= since]
+        if games:
+            newest = max(game["end_time"] for game in games)
+            with last_end_times_lock:
+                if newest > last_end_times.get(username, 0):
+                    last_end_times[username] = newest
+        return games
 
     # get archives in parallel by decorating the http request with defer
     @dlt.defer
-    def _get_archive(url: str) -> List[TDataItem]:
+    def _get_archive(url: str, username: str, month: str, since: int) -> List[TDataItem]:
         print(f"Getting archive from {url}")
         try:
-            games = get_url_with_retry(url).get("games", [])
-            return games  # type: ignore
+            games = _new_games(json.loads(cache.fetch(url)).get("games", []), username, since)
         except requests.HTTPError as http_err:
             # sometimes archives are not available and the error seems to be permanent
-            if http_err.response.status_code == 404:
-                return []
-            raise
+            if http_err.response.status_code != 404:
+                raise
+            games = []
+        _mark_loaded(username, month)
+        return games
+
+    def _stream_archive(url: str, username: str, month: str, since: int) -> Iterator[List[TDataItem]]:
+        print(f"Streaming archive from {url}")
+        try:
+            chunks = cache.fetch_stream(url)
+        except requests.HTTPError as http_err:
+            if http_err.response.status_code != 404:
+                raise
+            _mark_loaded(username, month)
+            return
+        for batch in batched(iter_json_array(chunks, "games"), batch_size):
+            games = _new_games(batch, username, since)
+            if games:
+                yield games
+        _mark_loaded(username, month)
 
     # enumerate the archives
     for url in archives:
         # the `url` format is https://api.chess.com/pub/player/{username}/games/{YYYY}/{MM}
-        if start_month and url[-7:] < start_month:
+        month = url[-7:]
+        if start_month and month < start_month:
             continue
-        if end_month and url[-7:] > end_month:
+        if end_month and month > end_month:
             continue
-        # do not download archive again
-        if url in checked_archives:
-            continue
-        checked_archives.append(url)
+        username = url.split("/")[-4].lower()
+        since = last_end_times.get(username, 0)
+        if since and month < pendulum.from_timestamp(since).format("YYYY/MM"):
+            # a month before the one with the player's newest loaded game has nothing new in it - if it was loaded
+            if month in loaded_months.get(username, []):
+                continue
+            # otherwise it's a backfill, and all of its games are new
+            since = 0
         # get the filtered archive
-        yield _get_archive(url)
+        if streaming:
+            yield from _stream_archive(url, username, month, since)
+        else:
+            yield _get_archive(url, username, month, since)
 
 
 @dlt.resource(write_disposition="append")
@@ -147,6 +254,109 @@ def players_online_status(players: List[str]) -> Iterator[TDataItem]:
         }
 
 
+@dlt.resource(write_disposition="append", selected=False)
+def players_online_status_concurrent(
+    players: List[str],
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    requests_per_second: Optional[float] = ONLINE_STATUS_REQUESTS_PER_SECOND,
+) -> Iterator[TDataItem]:
+    """
+    Same rows as `players_online_status`, but the players are polled concurrently, at most `max_concurrency` at a
+    time and `requests_per_second` overall, and rows are yielded as the responses come in rather than in `players`
+    order. The time each request took goes to the `players_online_status_latency` table - just the http call that
+    got the response, not the waits for the rate limit, a free slot or a retry.
+    Args:
+        players (List[str]): List of player usernames to check online status for.
+        max_concurrency (int, optional): Max requests in flight. Defaults to MAX_CONCURRENT_REQUESTS.
+        requests_per_second (float, optional): Max request rate, None for no limit. Defaults to
+            ONLINE_STATUS_REQUESTS_PER_SECOND.
+    Yields:
+        Iterator[TDataItem]: The online status of each player, and the latency of each request.
+    """
+    # its own client, so polling isn't held to the rate the archive downloads share
+    client = HttpClient(max_concurrency=max_concurrency, requests_per_second=requests_per_second)
+
+    def _get_status(player: str) -> Tuple[str, str, Any, float]:
+        url = f"{UNOFFICIAL_CHESS_API_URL}user/popup/{player}"
+        response = client.get(url)
+        return player, url, response.json(), response.elapsed.total_seconds()
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        for next_done in as_completed([executor.submit(_get_status, player) for player in players]):
+            player, url, status, latency = next_done.result()
+            check_time = pendulum.now()
+            # both go to named tables, the status rows to the same table as `players_online_status`
+            yield dlt.mark.with_table_name(
+                {
+                    "username": player,
+                    "onlineStatus": status["onlineStatus"],
+                    "lastLoginDate": status["lastLoginDate"],
+                    "check_time": check_time,
+                },
+                "players_online_status",
+            )
+            yield dlt.mark.with_table_name(
+                {"username": player, "url": url, "latency": latency, "check_time": check_time},
+                "players_online_status_latency",
+            )
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# hints for each table written by `parsed_games`, text columns are declared so they exist even when all null
+PARSED_TABLES: Dict[str, Dict[str, Any]] = {
+    "games": {
+        "primary_key": "url",
+        "columns": {
+            column: {"data_type": "text"}
+            for column in ["event", "date", "white", "black", "result", "eco", "opening_url", "time_control",
+                           "termination", "parse_error"]
+        },
+    },
+    "moves": {"primary_key": ("game_url", "ply"), "columns": {"clock": {"data_type": "text"}}},
+    "positions": {"primary_key": "fen_hash"},
+}
+
+
+@dlt.resource(write_disposition="merge")
+def parsed_games(
+    games: Iterable[Tuple[str, str]],
+    workers: int = None,
+    batch_size: int = PGN_BATCH_SIZE,
+) -> Iterator[TDataItem]:
+    """
+    Parses `(url, pgn)` pairs, usually read back from the `players_games` table, into normalized tables: `games`
+    with the PGN headers, `moves` with one row per ply, and `positions` keyed by a 64 bit hash of the FEN that the
+    moves refer to. Batches of games are parsed in parallel in a process pool.
+    Args:
+        games (Iterable[Tuple[str, str]]): The url and PGN of each game.
+        workers (int, optional): Number of parser processes. Defaults to the number of CPUs.
+        batch_size (int, optional): Games sent to a process at a time. Defaults to PGN_BATCH_SIZE. At most
+            PGN_BATCHES_IN_FLIGHT batches per process are read ahead of the one being yielded.
+    Yields:
+        Iterator[TDataItem]: Batches of rows for each of the three tables.
+    """
+    workers = workers or os.cpu_count() or 1
+    batches = batched(games, batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # submitted in a bounded window, in order, so only a few batches per process are held at once
+        window = workers * PGN_BATCHES_IN_FLIGHT
+        pending = deque(executor.submit(parse_games, batch) for batch in islice(batches, window))
+        while pending:
+            tables = pending.popleft().result()
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append(executor.submit(parse_games, batch))
+            for table_name, hints in PARSED_TABLES.items():
+                if tables[table_name]:
+                    yield dlt.mark.with_hints(
+                        tables[table_name],
+                        dlt.mark.make_hints(table_name=table_name, **hints),
+                        create_table_variant=True,
+                    )
+
+
 @dlt.source
 def chess_dlt_config_example(
     secret_str: str = dlt.secrets.value,
@@ -0,0 +1,174 @@
+"""On-disk conditional request cache for chess.com responses"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import dlt
+
+from . import helpers
+from .settings import HTTP_CACHE_MAX_BYTES, STREAM_CHUNK_SIZE
+
+
+class HttpCache:
+    """
+    Keeps the body and `ETag`/`Last-Modified` validators of each response in `directory` and sends them back as
+    `If-None-Match`/`If-Modified-Since`, so an unchanged resource comes back as an empty 304 and is read from disk
+    instead of being downloaded again.
+    The least recently used entries are evicted when the bodies add up to more than `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = HTTP_CACHE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return (
+            os.path.join(self.directory, f"{key}.body"),
+            os.path.join(self.directory, f"{key}.json"),
+        )
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _validators(self, url: str) -> Dict[str, Any]:
+        body_path, meta_path = self._paths(url)
+        if not os.path.exists(body_path):
+            return {}
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)  # type: ignore
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        validators = self._validators(url)
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def _touch(self, url: str) -> None:
+        try:
+            # mark as recently used for eviction
+            os.utime(self._paths(url)[0])
+        except FileNotFoundError:
+            pass
+
+    def _store_meta(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        meta = {"url": url, "etag": etag, "last_modified": last_modified}
+        self._write(self._paths(url)[1], json.dumps(meta).encode())
+        self.evict()
+
+    def _read_body(self, url: str) -> Optional[bytes]:
+        try:
+            with open(self._paths(url)[0], "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        self._touch(url)
+        return body
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Gets `url` through the shared client, and returns the cached copy when the server says it's still current.
+        Which games in it are new is left to the caller's resource state, which is only committed with the load, so
+        a load that fails after the response was cached still gets the games the next time.
+        """
+        response = helpers.client.get(url, headers=self._conditional_headers(url))
+        if response.status_code == 304:
+            body = self._read_body(url)
+            if body is not None:
+                return body
+            # evicted after the conditional headers were sent
+            response = helpers.client.get(url)
+
+        body = response.content
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if (etag or last_modified) and len(body) <= self.max_bytes:
+            self._write(self._paths(url)[0], body)
+            self._store_meta(url, etag, last_modified)
+        return body  # type: ignore[no-any-return]
+
+    def fetch_stream(self, url: str) -> Iterator[bytes]:
+        """
+        Like `fetch`, but returns an iterator over the body in chunks, which is written to the cache as it is read
+        instead of being held in memory - or read back from the cache when the server says it's still current. The
+        body is only cached once the iterator has been read to the end.
+        """
+        response = helpers.client.get(url, headers=self._conditional_headers(url), stream=True)
+        if response.status_code == 304:
+            response.close()
+            try:
+                f = open(self._paths(url)[0], "rb")
+            except FileNotFoundError:
+                # evicted after the conditional headers were sent
+                return self._stream_body(url, helpers.client.get(url, stream=True))
+            self._touch(url)
+            return self._stream_file(f)
+        return self._stream_body(url, response)
+
+    def _stream_file(self, f: Any) -> Iterator[bytes]:
+        with f:
+            yield from iter(lambda: f.read(STREAM_CHUNK_SIZE), b"")
+
+    def _stream_body(self, url: str, response: Any) -> Iterator[bytes]:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            if (etag or last_modified) and size <= self.max_bytes:
+                os.replace(tmp_path, self._paths(url)[0])
+                self._store_meta(url, etag, last_modified)
+        finally:
+            response.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the cached bodies fit in `max_bytes`"""
+        with self._lock:
+            entries: List[Tuple[float, int, str]] = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".body"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, body_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (body_path, body_path[: -len(".body")] + ".json"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+
+def pipeline_cache(max_bytes: int = HTTP_CACHE_MAX_BYTES) -> HttpCache:
+    """
+    Returns a cache in the working directory of the current pipeline, so it goes away together with the pipeline
+    state when the pipeline is dropped.
+    """
+    return HttpCache(
+        os.path.join(dlt.current.pipeline().working_dir, "http_cache"), max_bytes
+    )
@@ -1,20 +1,234 @@
 """Chess source helpers"""
 
+import codecs
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlsplit
+
 from dlt.common.typing import StrAny
 from dlt.sources.helpers import requests
+from dlt.sources.helpers.requests.retry import Session, _make_retry, wait_exponential, wait_exponential_retry_after
+from tenacity import RetryCallState
+
+from .settings import (
+    MAX_CONCURRENT_REQUESTS,
+    OFFICIAL_CHESS_API_URL,
+    REQUEST_BACKOFF_FACTOR,
+    REQUEST_MAX_ATTEMPTS,
+    REQUEST_MAX_RETRY_DELAY,
+    REQUEST_TIMEOUT,
+    REQUESTS_PER_SECOND_PER_HOST,
+    RETRY_STATUS_CODES,
+)
+
+
+class wait_full_jitter_retry_after(wait_exponential_retry_after):
+    """
+    Waits for `Retry-After` when the server sends one, like dlt's default, and otherwise a random time between zero and
+    the exponential backoff ("full jitter"), so clients that failed together don't all retry together
+    """
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        retry_after = self._get_retry_after(retry_state)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, wait_exponential.__call__(self, retry_state))
+
+
+class _RetryingClient(requests.Client):
+    """dlt's `requests.Client` with jittered backoff, calling `before_attempt(url)` before every attempt"""
+
+    def __init__(self, before_attempt: Callable[[str], None], **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._before_attempt = before_attempt
+
+    def _make_session(self) -> Session:
+        # the same session as dlt's, except that the wait and the hook go around each attempt, inside the retries
+        session = Session(**self._session_kwargs)  # type: ignore[arg-type]
+        for key, value in self._session_attrs.items():
+            setattr(session, key, value)
+        session.mount("http://", self._adapter)
+        session.mount("https://", self._adapter)
+        retry = _make_retry(**self._retry_kwargs)
+        retry = retry.copy(wait=wait_full_jitter_retry_after(multiplier=self._retry_kwargs["backoff_factor"],
+                                                             max=self._retry_kwargs["max_delay"]))
+        send = session.send
+
+        def send_attempt(request: Any, **kwargs: Any) -> requests.Response:
+            self._before_attempt(request.url)
+            return send(request, **kwargs)
+
+        session.send = retry.wraps(send_attempt)  # type: ignore[method-assign]
+        return session
+
+
+class HttpClient:
+    """
+    A shared http client for the chess.com endpoints, built on dlt's retrying `requests.Client`: every thread gets
+    its own session over one shared connection pool, and timeouts, connection errors and 429/5xx responses are
+    retried with exponential backoff and full jitter, or after the `Retry-After` delay when the server sends one. On
+    top of that, requests are limited to `max_concurrency` in flight and `requests_per_second` per host - counting
+    every attempt, retries included. A slot is held until the response is read: for `stream=True` that's until the
+    response is closed, so streamed responses must always be closed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        requests_per_second: Optional[float] = REQUESTS_PER_SECOND_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        max_attempts: int = REQUEST_MAX_ATTEMPTS,
+        backoff_factor: float = REQUEST_BACKOFF_FACTOR,
+        max_retry_delay: float = REQUEST_MAX_RETRY_DELAY,
+    ) -> None:
+        self._client = _RetryingClient(
+            self._wait_for_host,
+            request_timeout=timeout,
+            max_connections=max_concurrency,
+            status_codes=RETRY_STATUS_CODES,
+            request_max_attempts=max_attempts,
+            request_backoff_factor=backoff_factor,
+            request_max_retry_delay=max_retry_delay,
+        )
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_request_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _wait_for_host(self, url: str) -> None:
+        if not self._interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at.get(host, now))
+            self._next_request_at[host] = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
 
-from .settings import OFFICIAL_CHESS_API_URL
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """Gets `url`, retrying transient failures, and raises `HTTPError` for any error status left at the end"""
+        # the slot is held through the retries, so a server that's pushing back gets fewer requests, not more
+        self._slots.acquire()
+        try:
+            response = self._client.get(url, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        if not kwargs.get("stream"):
+            self._slots.release()
+            return response
+
+        # a streamed body is read after get() returns, so the slot goes back when the response is closed
+        close = response.close
+        released = False
+
+        def _close() -> None:
+            nonlocal released
+            try:
+                close()
+            finally:
+                with self._lock:
+                    release, released = not released, True
+                if release:
+                    self._slots.release()
+
+        response.close = _close  # type: ignore[method-assign]
+        return response
+
+
+client = HttpClient()
+
+
+def configure_client(**kwargs: Any) -> HttpClient:
+    """Replaces the shared client with one built from `kwargs`, see `HttpClient` for the options"""
+    global client
+    client = HttpClient(**kwargs)
+    return client
 
 
 def get_url_with_retry(url: str) -> StrAny:
-    r = requests.get(url)
-    return r.json()  # type: ignore
+    return client.get(url).json()  # type: ignore
 
 
 def get_path_with_retry(path: str) -> StrAny:
     return get_url_with_retry(f"{OFFICIAL_CHESS_API_URL}{path}")
 
 
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """
+    Yields the items of the array under the top level `key` of a JSON document that arrives in `chunks`, one at a
+    time, so only the item being decoded and the unread part of the current chunk are in memory. `chunks` is read to
+    the end either way, also past the array. Assumes the items are objects or arrays and that nothing before the key
+    looks like `"key": [`, both true for chess.com archives.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    whitespace = re.compile(r"[\s,]*")
+    buffer = ""
+    pos = None
+    exhausted = False
+
+    def _more() -> bool:
+        nonlocal buffer, pos, exhausted
+        # drop what has been decoded already before adding the next chunk
+        if pos:
+            buffer = buffer[pos:]
+            pos = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text.decode(b"", final=True)
+            return False
+        buffer += text.decode(chunk)
+        return True
+
+    while pos is None:
+        match = start.search(buffer)
+        if match:
+            pos = match.end()
+        elif not _more():
+            return
+
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not _more():
+                raise ValueError(f"unterminated '{key}' array")
+            continue
+        if buffer[pos] == "]":
+            # read the rest, so whatever is behind `chunks` (like the cache writing the body to disk) sees it all
+            for _ in chunks:
+                pass
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # most likely the item is cut off at the end of the chunk
+            if exhausted or not _more():
+                raise
+            continue
+        yield item
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Groups `items` into lists of at most `size`"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def validate_month_string(string: str) -> None:
     """Validates that the string is in YYYY/MM format"""
     if string and string[4] != "/":
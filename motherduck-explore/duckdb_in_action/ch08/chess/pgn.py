@@ -0,0 +1,336 @@
+"""PGN parsing and move replay for the parsed games tables
+
+python-chess would shadow (or be shadowed by) this `chess` package, so this is a small standalone replayer: it
+understands SAN for standard chess, including castling, promotion, en passant and disambiguation, which is all that
+is needed to turn a chess.com PGN into FENs.
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_STEPS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+ROOK_RAYS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_RAYS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+RAYS = {"B": BISHOP_RAYS, "R": ROOK_RAYS, "Q": ROOK_RAYS + BISHOP_RAYS}
+
+SAN_RE = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?[+#]?$")
+TAG_RE = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$', re.MULTILINE)
+TOKEN_RE = re.compile(r"\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|\d+\.+|[^\s(){};]+")
+CLOCK_RE = re.compile(r"\[%clk\s+([\d:.]+)\]")
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+
+def _square(name: str) -> int:
+    return (int(name[1]) - 1) * 8 + ord(name[0]) - ord("a")
+
+
+def _name(square: int) -> str:
+    return "abcdefgh"[square % 8] + str(square // 8 + 1)
+
+
+def _step(square: int, df: int, dr: int) -> Optional[int]:
+    file, rank = square % 8 + df, square // 8 + dr
+    if 0 <= file < 8 and 0 <= rank < 8:
+        return rank * 8 + file
+    return None
+
+
+class Position:
+    """A board plus the rest of the FEN state, updated in place by `push_san`"""
+
+    def __init__(self, fen: str = START_FEN) -> None:
+        placement, turn, castling, ep, halfmove, fullmove = (fen.split() + ["0", "1"])[:6]
+        self.board: List[Optional[str]] = [None] * 64
+        for rank, row in enumerate(reversed(placement.split("/"))):
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                else:
+                    self.board[rank * 8 + file] = char
+                    file += 1
+        self.turn = turn
+        self.castling = "" if castling == "-" else castling
+        self.ep = None if ep == "-" else _square(ep)
+        self.halfmove = int(halfmove)
+        self.fullmove = int(fullmove)
+
+    def _piece(self, kind: str, color: str) -> str:
+        return kind if color == "w" else kind.lower()
+
+    def attacked(self, square: int, by: str) -> bool:
+        """Whether `square` is attacked by any piece of color `by`"""
+        board = self.board
+        pawn_dr = -1 if by == "w" else 1
+        for df in (-1, 1):
+            s = _step(square, df, pawn_dr)
+            if s is not None and board[s] == self._piece("P", by):
+                return True
+        for kind, steps in (("N", KNIGHT_STEPS), ("K", KING_STEPS)):
+            for df, dr in steps:
+                s = _step(square, df, dr)
+                if s is not None and board[s] == self._piece(kind, by):
+                    return True
+        for kinds, rays in (("RQ", ROOK_RAYS), ("BQ", BISHOP_RAYS)):
+            attackers = {self._piece(kind, by) for kind in kinds}
+            for df, dr in rays:
+                s = _step(square, df, dr)
+                while s is not None:
+                    if board[s] is not None:
+                        if board[s] in attackers:
+                            return True
+                        break
+                    s = _step(s, df, dr)
+        return False
+
+    def _leaves_king_attacked(self, start: int, end: int, captured: Optional[int] = None) -> bool:
+        board = self.board
+        saved = {square: board[square] for square in (start, end, captured) if square is not None}
+        if captured is not None:
+            board[captured] = None
+        board[end], board[start] = board[start], None
+        king = board.index(self._piece("K", self.turn))
+        in_check = self.attacked(king, "b" if self.turn == "w" else "w")
+        for square, piece in saved.items():
+            board[square] = piece
+        return in_check
+
+    def _origins(self, kind: str, target: int) -> List[int]:
+        """Squares a `kind` piece of the side to move could move to `target` from, ignoring pins"""
+        piece = self._piece(kind, self.turn)
+        origins = []
+        if kind in RAYS:
+            for df, dr in RAYS[kind]:
+                s = _step(target, df, dr)
+                while s is not None:
+                    if self.board[s] is not None:
+                        if self.board[s] == piece:
+                            origins.append(s)
+                        break
+                    s = _step(s, df, dr)
+        else:
+            for df, dr in KNIGHT_STEPS if kind == "N" else KING_STEPS:
+                s = _step(target, df, dr)
+                if s is not None and self.board[s] == piece:
+                    origins.append(s)
+        return origins
+
+    def _castle(self, long: bool) -> Tuple[int, int]:
+        rank = 0 if self.turn == "w" else 56
+        king = rank + 4
+        rook_from, rook_to, king_to = (rank, rank + 3, rank + 2) if long else (rank + 7, rank + 5, rank + 6)
+        self.board[king_to], self.board[king] = self.board[king], None
+        self.board[rook_to], self.board[rook_from] = self.board[rook_from], None
+        return king, king_to
+
+    def push_san(self, san: str) -> str:
+        """Plays `san` and returns the move in UCI notation"""
+        san = san.rstrip("+#!?")
+        board = self.board
+        white = self.turn == "w"
+        captured = None
+        promotion = None
+
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            start, end = self._castle(long=san.count("O") + san.count("0") == 3)
+            kind = "K"
+        else:
+            match = SAN_RE.match(san)
+            if not match:
+                raise ValueError(f"can't parse move {san!r}")
+            kind, from_file, from_rank, capture, target, promotion = match.groups()
+            end = _square(target)
+
+            if kind is None:
+                kind = "P"
+                forward = 8 if white else -8
+                if capture:
+                    if not from_file:
+                        raise ValueError(f"can't parse move {san!r}")
+                    start = end - forward + ord(from_file) - ord(target[0])
+                    if board[end] is None and end == self.ep:
+                        captured = end - forward
+                else:
+                    start = end - forward
+                    if board[start] is None:
+                        start -= forward
+            else:
+                origins = [
+                    s
+                    for s in self._origins(kind, end)
+                    if (not from_file or _name(s)[0] == from_file) and (not from_rank or _name(s)[1] == from_rank)
+                ]
+                if len(origins) > 1:
+                    origins = [s for s in origins if not self._leaves_king_attacked(s, end)]
+                if len(origins) != 1:
+                    raise ValueError(f"illegal or ambiguous move {san!r}")
+                start = origins[0]
+
+            if board[start] != self._piece(kind, self.turn):
+                raise ValueError(f"illegal move {san!r}")
+            if captured is None and board[end] is not None:
+                captured = end
+            # a pinned piece, or a king walking into check
+            if self._leaves_king_attacked(start, end, captured):
+                raise ValueError(f"illegal move {san!r}, it leaves the king in check")
+            if captured is not None:
+                board[captured] = None
+            board[end], board[start] = board[start], None
+            if promotion:
+                board[end] = self._piece(promotion, self.turn)
+
+        # castling rights go when the king moves or a rook moves from, or is captured on, its corner
+        for square, right in ((4, "KQ"), (60, "kq"), (0, "Q"), (7, "K"), (56, "q"), (63, "k")):
+            if square in (start, end):
+                self.castling = "".join(c for c in self.castling if c not in right)
+
+        # only keep an en passant square when there is a pawn next to it to take, like X-FEN
+        self.ep = None
+        if kind == "P" and abs(end - start) == 16:
+            enemy_pawn = "p" if white else "P"
+            if any(_step(end, df, 0) is not None and board[_step(end, df, 0)] == enemy_pawn for df in (-1, 1)):
+                self.ep = (start + end) // 2
+
+        self.halfmove = 0 if kind == "P" or captured is not None else self.halfmove + 1
+        if not white:
+            self.fullmove += 1
+        self.turn = "b" if white else "w"
+        return _name(start) + _name(end) + (promotion.lower() if promotion else "")
+
+    def placement(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for piece in self.board[rank * 8 : rank * 8 + 8]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece
+            rows.append(row + (str(empty) if empty else ""))
+        return "/".join(rows)
+
+    def epd(self) -> str:
+        """The FEN without the move counters, which is what identifies a position across games"""
+        ep = _name(self.ep) if self.ep is not None else "-"
+        return f"{self.placement()} {self.turn} {self.castling or '-'} {ep}"
+
+    def fen(self) -> str:
+        return f"{self.epd()} {self.halfmove} {self.fullmove}"
+
+
+def fen_hash(epd: str) -> int:
+    """A signed 64 bit hash of a position, to fit a DuckDB BIGINT"""
+    return int.from_bytes(hashlib.blake2b(epd.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def parse_pgn(pgn: str) -> Tuple[Dict[str, str], Iterator[Tuple[str, Optional[str]]]]:
+    """Returns the tags of a PGN and an iterator over the (SAN, clock) of each main line move"""
+    tags = dict(TAG_RE.findall(pgn))
+    movetext = TAG_RE.sub("", pgn)
+
+    def _moves() -> Iterator[Tuple[str, Optional[str]]]:
+        depth = 0
+        pending = None
+        for token in TOKEN_RE.findall(movetext):
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+            elif depth:
+                continue
+            elif token.startswith("{"):
+                clock = CLOCK_RE.search(token)
+                if pending and clock:
+                    yield pending, clock.group(1)
+                    pending = None
+            elif token[0] in ";$" or token[0].isdigit() and token.rstrip(".").isdigit() or token in RESULTS:
+                continue
+            else:
+                if pending:
+                    yield pending, None
+                pending = token
+        if pending:
+            yield pending, None
+
+    return tags, _moves()
+
+
+def parse_game(url: str, pgn: str) -> Dict[str, Any]:
+    """
+    Replays one game and returns its `game` row, its `moves` rows and the `positions` it went through. A game that
+    can't be replayed - a variant, or a broken PGN - still gets its game row, with the error in `parse_error`.
+    """
+    tags, moves = parse_pgn(pgn or "")
+    game: Dict[str, Any] = {
+        "url": url,
+        "event": tags.get("Event"),
+        "date": tags.get("Date"),
+        "white": tags.get("White"),
+        "black": tags.get("Black"),
+        "result": tags.get("Result"),
+        "eco": tags.get("ECO"),
+        "opening_url": tags.get("ECOUrl"),
+        "time_control": tags.get("TimeControl"),
+        "termination": tags.get("Termination"),
+        "ply_count": 0,
+        "parse_error": None,
+    }
+    move_rows: List[Dict[str, Any]] = []
+    positions: Dict[int, str] = {}
+
+    if tags.get("Variant", "Standard") not in ("Standard", ""):
+        game["parse_error"] = f"unsupported variant {tags['Variant']}"
+        return {"game": game, "moves": move_rows, "positions": []}
+
+    try:
+        position = Position(tags.get("FEN", START_FEN))
+        before = position.epd()
+        positions[fen_hash(before)] = before
+        for ply, (san, clock) in enumerate(moves, start=1):
+            uci = position.push_san(san)
+            after = position.epd()
+            after_hash = fen_hash(after)
+            positions[after_hash] = after
+            move_rows.append(
+                {
+                    "game_url": url,
+                    "ply": ply,
+                    "san": san,
+                    "uci": uci,
+                    "clock": clock,
+                    "fen_hash_before": fen_hash(before),
+                    "fen_hash_after": after_hash,
+                }
+            )
+            before = after
+    except ValueError as err:
+        game["parse_error"] = str(err)
+
+    game["ply_count"] = len(move_rows)
+    return {
+        "game": game,
+        "moves": move_rows,
+        "positions": [{"fen_hash": h, "fen": fen} for h, fen in positions.items()],
+    }
+
+
+def parse_games(games: List[Tuple[str, str]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Parses a batch of `(url, pgn)` pairs into rows for the games, moves and positions tables"""
+    tables: Dict[str, List[Dict[str, Any]]] = {"games": [], "moves": [], "positions": []}
+    seen = set()
+    for url, pgn in games:
+        parsed = parse_game(url, pgn)
+        tables["games"].append(parsed["game"])
+        tables["moves"].extend(parsed["moves"])
+        for position in parsed["positions"]:
+            if position["fen_hash"] not in seen:
+                seen.add(position["fen_hash"])
+                tables["positions"].append(position)
+    return tables
@@ -2,3 +2,27 @@
 
 OFFICIAL_CHESS_API_URL = "https://api.chess.com/pub/"
 UNOFFICIAL_CHESS_API_URL = "https://www.chess.com/callback/"
+
+# defaults for the shared http client in helpers.py
+REQUEST_TIMEOUT = 30
+MAX_CONCURRENT_REQUESTS = 8
+REQUESTS_PER_SECOND_PER_HOST = 10
+REQUEST_MAX_ATTEMPTS = 5
+REQUEST_BACKOFF_FACTOR = 1
+REQUEST_MAX_RETRY_DELAY = 60
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# players_online_status_concurrent has its own client, with its own request rate
+ONLINE_STATUS_REQUESTS_PER_SECOND = 50
+
+# upper bound on the size of the on-disk archive cache in cache.py
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# players_games(streaming=True) reads archives in chunks of this many bytes and yields games in batches of this size
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAMING_BATCH_SIZE = 500
+
+# games handed to each parser process at a time by parsed_games
+PGN_BATCH_SIZE = 200
+# batches in flight per parser process, so a big backlog of games isn't all read and queued up front
+PGN_BATCHES_IN_FLIGHT = 2
@@ -1,5 +1,8 @@
+from typing import Any, Iterator, Tuple
+
 import dlt
-from chess import source
+from chess import parsed_games, source
+from chess.settings import PGN_BATCH_SIZE
 
 
 def load_players_games_example(start_month: str, end_month: str) -> None:
@@ -22,6 +25,47 @@ def load_players_games_example(start_month: str, end_month: str) -> None:
     print(info)
 
 
+def fetch_rows(cursor: Any, batch_size: int = PGN_BATCH_SIZE) -> Iterator[Tuple[Any, ...]]:
+    """Yields the rows of a query `batch_size` at a time, so a large result is never held in memory whole"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def parse_players_games() -> None:
+    """
+    Parses the PGN of every loaded game that hasn't been parsed yet into games, moves and positions tables next to
+    players_games, and indexes them so opening and position lookups don't scan every game. The games are streamed
+    from the query into the parser while the rows are extracted, then normalized and loaded once the query is done.
+    """
+
+    pipeline = dlt.pipeline(
+        pipeline_name="chess_pipeline",
+        destination='duckdb',
+        dataset_name="chess_players_games_data",
+    )
+    with pipeline.sql_client() as client:
+        parsed_before = client.execute_sql(
+            "SELECT count(*) FROM information_schema.tables"
+            f" WHERE table_schema = '{client.dataset_name}' AND table_name = 'games'"
+        )[0][0]
+        query = "SELECT url, pgn FROM players_games WHERE pgn IS NOT NULL"
+        if parsed_before:
+            query += " AND url NOT IN (SELECT url FROM games)"
+        with client.execute_query(query) as cursor:
+            pipeline.extract(parsed_games(fetch_rows(cursor)))
+
+    pipeline.normalize()
+    info = pipeline.load()
+    print(info)
+
+    with pipeline.sql_client() as client:
+        for table, column in [("games", "eco"), ("moves", "fen_hash_after"), ("positions", "fen_hash")]:
+            client.execute_sql(f"CREATE INDEX IF NOT EXISTS {table}_{column}_idx ON {table} ({column})")
+
+
 def load_players_online_status() -> None:
     """Constructs a pipeline that will append online status of selected players"""
 
@@ -35,15 +79,29 @@ def load_players_online_status() -> None:
     print(info)
 
 
+def load_players_online_status_concurrent() -> None:
+    """Same as load_players_online_status, but polls the players concurrently and records request latency"""
+
+    pipeline = dlt.pipeline(
+        pipeline_name="chess_pipeline",
+        destination='duckdb',
+        dataset_name="chess_players_games_data",
+    )
+    data = source(["magnuscarlsen", "vincentkeymer", "dommarajugukesh", "rpragchess"])
+    info = pipeline.run(data.with_resources("players_online_status_concurrent"))
+    print(info)
+
+
 def load_players_games_incrementally() -> None:
-    """Pipeline will not load the same game archive twice"""
+    """Pipeline will not load the same game twice"""
     # loads games for 11.2022
     load_players_games_example("2022/11", "2022/11")
-    # second load skips games for 11.2022 but will load for 12.2022
+    # second load skips games already loaded for 11.2022 but will load for 12.2022
     load_players_games_example("2022/11", "2022/12")
 
 
 if __name__ == "__main__":
     # run our main example
     load_players_games_example("2022/11", "2022/12")
+    parse_players_games()
     load_players_online_status()
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from chess import cache, helpers
+
+ARCHIVE = json.dumps({"games": [{"url": "https://www.chess.com/game/live/1", "end_time": 100}]}).encode()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_client(monkeypatch):
+    monkeypatch.setattr(helpers, "client", helpers.HttpClient(requests_per_second=None, backoff_factor=0.01))
+
+
+def test_fetch_returns_cached_body_on_304(stub_server, tmp_path):
+    stub_server.respond("/games/2024/01", (200, {"ETag": '"v1"'}, ARCHIVE), (304, {}, b""))
+    http_cache = cache.HttpCache(str(tmp_path))
+    url = f"{stub_server.url}/games/2024/01"
+
+    assert http_cache.fetch(url) == ARCHIVE
+    # the second run gets a 304, and the games are still there for a load that didn't make it the first time
+    assert http_cache.fetch(url) == ARCHIVE
+
+    first, second = stub_server.requests_for("/games/2024/01")
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == '"v1"'
+
+
+def test_fetch_refetches_when_body_was_evicted(stub_server, tmp_path):
+    stub_server.respond("/games/2024/02", (200, {"ETag": '"v1"'}, ARCHIVE), (200, {}, ARCHIVE))
+    http_cache = cache.HttpCache(str(tmp_path), max_bytes=len(ARCHIVE))
+    url = f"{stub_server.url}/games/2024/02"
+    http_cache.fetch(url)
+    # validators without a body aren't sent
+    http_cache.max_bytes = 0
+    http_cache.evict()
+
+    assert http_cache.fetch(url) == ARCHIVE
+    assert "If-None-Match" not in stub_server.requests_for("/games/2024/02")[1]
+
+
+def test_fetch_without_validators_is_not_cached(stub_server, tmp_path):
+    stub_server.respond("/games/2024/03", (200, {}, ARCHIVE))
+    http_cache = cache.HttpCache(str(tmp_path))
+
+    assert http_cache.fetch(f"{stub_server.url}/games/2024/03") == ARCHIVE
+    assert list(tmp_path.iterdir()) == []
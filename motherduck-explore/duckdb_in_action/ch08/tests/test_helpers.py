@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from dlt.sources.helpers import requests
+
+from chess import helpers
+
+
+def test_client_retries_429_then_succeeds(stub_server):
+    stub_server.respond(
+        "/pub/player/someone",
+        (429, {"Retry-After": "1"}, b""),
+        (200, {"Content-Type": "application/json"}, b'{"username": "someone"}'),
+    )
+    client = helpers.HttpClient(requests_per_second=None, backoff_factor=0.01)
+
+    started = time.monotonic()
+    response = client.get(f"{stub_server.url}/pub/player/someone")
+
+    assert response.json() == {"username": "someone"}
+    assert len(stub_server.requests_for("/pub/player/someone")) == 2
+    # waited for Retry-After rather than the much shorter backoff
+    assert time.monotonic() - started >= 1
+
+
+def test_client_backs_off_on_5xx(stub_server):
+    stub_server.respond("/flaky", (503, {}, b""), (502, {}, b""), (200, {}, b"ok"))
+    client = helpers.HttpClient(requests_per_second=None, backoff_factor=0.01)
+
+    assert client.get(f"{stub_server.url}/flaky").text == "ok"
+    assert len(stub_server.requests_for("/flaky")) == 3
+
+
+def test_client_gives_up_after_max_attempts(stub_server):
+    stub_server.respond("/down", (503, {}, b""))
+    client = helpers.HttpClient(requests_per_second=None, backoff_factor=0.01, max_attempts=3)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(f"{stub_server.url}/down")
+    assert len(stub_server.requests_for("/down")) == 3
+
+
+def test_client_does_not_retry_404(stub_server):
+    client = helpers.HttpClient(requests_per_second=None, backoff_factor=0.01)
+
+    with pytest.raises(requests.HTTPError) as error:
+        client.get(f"{stub_server.url}/missing")
+    assert error.value.response.status_code == 404
+    assert len(stub_server.requests_for("/missing")) == 1
+
+
+def test_client_throttles_per_host(stub_server):
+    stub_server.respond("/fast", (200, {}, b"ok"))
+    client = helpers.HttpClient(requests_per_second=20)
+
+    started = time.monotonic()
+    for _ in range(5):
+        client.get(f"{stub_server.url}/fast")
+    assert time.monotonic() - started >= 4 / 20
+
+
+def test_backoff_has_full_jitter():
+    wait = helpers.wait_full_jitter_retry_after(multiplier=1, max=60)
+    # a 503 without Retry-After, on the fourth attempt
+    response = requests.Response()
+    response.status_code = 503
+    outcome = Future()
+    outcome.set_result(response)
+    state = SimpleNamespace(attempt_number=4, outcome=outcome)
+    waits = {wait(state) for _ in range(50)}
+
+    # anywhere from zero up to the 2 ** 3 seconds of plain exponential backoff, not always the same
+    assert all(0 <= seconds <= 8 for seconds in waits)
+    assert len(waits) > 1
+
+
+def test_client_throttles_retries_too(stub_server):
+    stub_server.respond("/busy", (503, {}, b""), (503, {}, b""), (200, {}, b"ok"))
+    client = helpers.HttpClient(requests_per_second=5, backoff_factor=0.001)
+
+    started = time.monotonic()
+    assert client.get(f"{stub_server.url}/busy").text == "ok"
+    # three attempts at 5 per second, although the backoff alone would be a few milliseconds
+    assert time.monotonic() - started >= 2 / 5
+
+
+def test_streamed_response_holds_its_slot_until_closed(stub_server):
+    stub_server.respond("/archive", (200, {}, b"games"))
+    client = helpers.HttpClient(max_concurrency=1, requests_per_second=None)
+    url = f"{stub_server.url}/archive"
+
+    streamed = client.get(url, stream=True)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        second = executor.submit(client.get, url)
+        time.sleep(0.2)
+        assert not second.done()
+        assert b"".join(streamed.iter_content(2)) == b"games"
+        streamed.close()
+        assert second.result(timeout=5).text == "games"
+    # closing twice doesn't hand back a slot that isn't held
+    streamed.close()
+    assert client._slots.acquire(blocking=False)
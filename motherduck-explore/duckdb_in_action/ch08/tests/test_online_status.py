@@ -0,0 +1,40 @@
+import json
+import time
+
+import chess
+from chess import players_online_status_concurrent
+
+STATUS = json.dumps({"onlineStatus": "online", "lastLoginDate": 1704067200}).encode()
+
+
+def _poll(players, **kwargs):
+    rows = list(players_online_status_concurrent(players, **kwargs))
+    statuses = [row for row in rows if "onlineStatus" in row]
+    latencies = [row for row in rows if "latency" in row]
+    return statuses, latencies
+
+
+def test_polls_every_player(stub_server, monkeypatch):
+    monkeypatch.setattr(chess, "UNOFFICIAL_CHESS_API_URL", f"{stub_server.url}/callback/")
+    players = [f"player{i}" for i in range(40)]
+    for player in players:
+        stub_server.respond(f"/callback/user/popup/{player}", (200, {}, STATUS))
+
+    statuses, latencies = _poll(players, requests_per_second=None)
+
+    assert sorted(row["username"] for row in statuses) == sorted(players)
+    assert sorted(row["username"] for row in latencies) == sorted(players)
+
+
+def test_latency_leaves_out_the_rate_limit(stub_server, monkeypatch):
+    monkeypatch.setattr(chess, "UNOFFICIAL_CHESS_API_URL", f"{stub_server.url}/callback/")
+    players = [f"player{i}" for i in range(10)]
+    for player in players:
+        stub_server.respond(f"/callback/user/popup/{player}", (200, {}, STATUS))
+
+    started = time.monotonic()
+    _, latencies = _poll(players, requests_per_second=10)
+
+    # the rate limit spreads the requests over most of a second, none of which is in the latencies
+    assert time.monotonic() - started >= 0.9
+    assert max(row["latency"] for row in latencies) < 0.5
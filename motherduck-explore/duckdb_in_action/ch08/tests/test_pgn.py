@@ -0,0 +1,138 @@
+import dlt
+import pytest
+
+from chess import parsed_games
+from chess.pgn import Position, parse_game
+
+ITALIAN = """[Event "Live Chess"]
+[White "someone"]
+[Black "someone_else"]
+[Result "*"]
+[ECO "C50"]
+
+1. e4 {[%clk 0:03:00]} 1... e5 {[%clk 0:02:59.9]} 2. Nf3 Nc6 (2... d6 3. d4) 3. Bc4 Bc5 4. O-O Nf6 5. d3 O-O *"""
+
+
+def play(fen, *moves):
+    """Plays the SAN `moves` from `fen` and returns their UCI and the FEN they lead to"""
+    position = Position(fen)
+    return [position.push_san(san) for san in moves], position.fen()
+
+
+def test_castling_both_sides():
+    ucis, fen = play("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "O-O", "O-O-O")
+    assert ucis == ["e1g1", "e8c8"]
+    assert fen == "2kr3r/8/8/8/8/8/8/R4RK1 w - - 2 2"
+
+
+def test_capturing_a_rook_on_its_corner_takes_the_castling_right():
+    ucis, fen = play("r3k2r/8/8/8/8/8/6b1/R3K2R b KQkq - 0 1", "Bxh1", "O-O-O", "O-O")
+    assert ucis == ["g2h1", "e1c1", "e8g8"]
+    assert fen == "r4rk1/8/8/8/8/8/8/2KR3b w - - 2 3"
+
+
+def test_en_passant():
+    ucis, fen = play(
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", "e4", "a6", "e5", "d5"
+    )
+    assert ucis == ["e2e4", "a7a6", "e4e5", "d7d5"]
+    # only a double step that can be taken en passant leaves the square in the FEN
+    assert fen == "rnbqkbnr/1pp1pppp/p7/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"
+
+    ucis, fen = play(fen, "exd6")
+    assert ucis == ["e5d6"]
+    assert fen == "rnbqkbnr/1pp1pppp/p2P4/8/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 3"
+
+
+@pytest.mark.parametrize(
+    "fen, san, uci, after",
+    [
+        ("8/P6k/8/8/8/8/8/K7 w - - 0 1", "a8=Q", "a7a8q", "Q7/7k/8/8/8/8/8/K7 b - - 0 1"),
+        ("r6k/1P6/8/8/8/8/8/K7 w - - 0 1", "bxa8=N+", "b7a8n", "N6k/8/8/8/8/8/8/K7 b - - 0 1"),
+    ],
+)
+def test_promotion(fen, san, uci, after):
+    assert play(fen, san) == ([uci], after)
+
+
+@pytest.mark.parametrize(
+    "fen, san, uci, after",
+    [
+        ("4k3/8/8/8/8/5N2/8/KN6 w - - 0 1", "Nbd2", "b1d2", "4k3/8/8/8/8/5N2/3N4/K7 b - - 1 1"),
+        ("4k3/8/8/R7/8/8/8/R3K3 w - - 0 1", "R1a3", "a1a3", "4k3/8/8/R7/8/R7/8/4K3 b - - 1 1"),
+    ],
+)
+def test_disambiguation(fen, san, uci, after):
+    assert play(fen, san) == ([uci], after)
+
+
+def test_ambiguous_move_is_rejected():
+    with pytest.raises(ValueError, match="ambiguous"):
+        play("4k3/8/8/8/8/5N2/8/KN6 w - - 0 1", "Nd2")
+
+
+def test_pinned_knight_is_not_a_candidate():
+    # the d2 knight is pinned by the b4 bishop, so Nf3 can only be the g1 knight
+    assert play("4k3/8/8/8/1b6/8/3N4/4K1N1 w - - 0 1", "Nf3") == (
+        ["g1f3"],
+        "4k3/8/8/8/1b6/5N2/3N4/4K3 b - - 1 1",
+    )
+
+
+@pytest.mark.parametrize(
+    "fen, san",
+    [
+        ("4k3/8/8/8/1b6/8/3N4/4K3 w - - 0 1", "Nf3"),
+        ("4k3/8/8/8/1b6/8/3P4/4K3 w - - 0 1", "d3"),
+        ("4k3/8/8/8/8/8/3r4/4K3 w - - 0 1", "Kd1"),
+    ],
+)
+def test_move_leaving_the_king_in_check_is_illegal(fen, san):
+    with pytest.raises(ValueError, match="illegal"):
+        play(fen, san)
+
+
+def test_parse_game_skips_variations_and_keeps_clocks():
+    parsed = parse_game("https://www.chess.com/game/live/1", ITALIAN)
+    moves = parsed["moves"]
+    positions = {row["fen_hash"]: row["fen"] for row in parsed["positions"]}
+
+    assert parsed["game"]["eco"] == "C50"
+    assert parsed["game"]["parse_error"] is None
+    assert [move["uci"] for move in moves] == [
+        "e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "f8c5", "e1g1", "g8f6", "d2d3", "e8g8",
+    ]
+    assert [move["clock"] for move in moves[:3]] == ["0:03:00", "0:02:59.9", None]
+    assert positions[moves[-1]["fen_hash_after"]] == "r1bq1rk1/pppp1ppp/2n2n2/2b1p3/2B1P3/3P1N2/PPP2PPP/RNBQ1RK1 w - -"
+    assert len(positions) == 11
+
+
+def test_parsed_games_loads_the_tables(tmp_path):
+    games = [
+        ("https://www.chess.com/game/live/1", ITALIAN),
+        ("https://www.chess.com/game/live/2", "1. e4 e5 2. Ke3 *"),
+    ]
+    pipeline = dlt.pipeline(
+        pipeline_name="chess_parsed_games_test",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "games.duckdb")),
+        dataset_name="chess",
+    )
+    # the games, and the positions they share, are merged on their keys when parsed again
+    for _ in range(2):
+        pipeline.run(parsed_games(iter(games), workers=1, batch_size=1))
+
+    with pipeline.sql_client() as client:
+        counts = {
+            table: client.execute_sql(f"SELECT count(*) FROM {table}")[0][0] for table in ("games", "moves", "positions")
+        }
+        errors = dict(client.execute_sql("SELECT url, parse_error FROM games"))
+        ply_counts = dict(client.execute_sql("SELECT url, ply_count FROM games"))
+
+    # the broken game keeps the moves before the illegal one, and its positions are already known
+    assert counts == {"games": 2, "moves": 12, "positions": 11}
+    assert errors == {
+        "https://www.chess.com/game/live/1": None,
+        "https://www.chess.com/game/live/2": "illegal or ambiguous move 'Ke3'",
+    }
+    assert ply_counts == {"https://www.chess.com/game/live/1": 10, "https://www.chess.com/game/live/2": 2}
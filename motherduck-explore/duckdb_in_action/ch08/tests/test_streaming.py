@@ -0,0 +1,82 @@
+import json
+
+import dlt
+import pytest
+
+from chess import cache, helpers, source
+from chess.helpers import iter_json_array
+
+GAMES = [{"url": f"https://www.chess.com/game/live/{i}", "end_time": 1704067200 + i, "pgn": "1. e4 *"} for i in range(5)]
+ARCHIVE = json.dumps({"games": GAMES, "player": "someone"}).encode()
+
+
+@pytest.fixture(autouse=True)
+def unthrottled_client(monkeypatch):
+    monkeypatch.setattr(helpers, "client", helpers.HttpClient(requests_per_second=None, backoff_factor=0.01))
+
+
+def test_streamed_body_is_cached_once_the_array_is_read(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "STREAM_CHUNK_SIZE", 16)
+    stub_server.respond("/games/2024/01", (200, {"ETag": '"v1"'}, ARCHIVE), (304, {}, b""))
+    http_cache = cache.HttpCache(str(tmp_path))
+    url = f"{stub_server.url}/games/2024/01"
+
+    assert list(iter_json_array(http_cache.fetch_stream(url), "games")) == GAMES
+    assert list(iter_json_array(http_cache.fetch_stream(url), "games")) == GAMES
+
+    first, second = stub_server.requests_for("/games/2024/01")
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == '"v1"'
+
+
+def test_streaming_pipeline_sends_validators_on_second_run(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, "OFFICIAL_CHESS_API_URL", f"{stub_server.url}/pub/")
+    archive_path = "/pub/player/someone/games/2024/01"
+    stub_server.respond(
+        "/pub/player/someone/games/archives",
+        (200, {}, json.dumps({"archives": [stub_server.url + archive_path]}).encode()),
+    )
+    stub_server.respond(archive_path, (200, {"ETag": '"v1"'}, ARCHIVE), (304, {}, b""))
+
+    pipeline = dlt.pipeline(
+        pipeline_name="chess_streaming_test",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "games.duckdb")),
+        dataset_name="chess",
+    )
+    for _ in range(2):
+        pipeline.run(source(["someone"], streaming=True, batch_size=2).with_resources("players_games"))
+
+    first, second = stub_server.requests_for(archive_path)
+    assert "If-None-Match" not in first
+    assert second["If-None-Match"] == '"v1"'
+    with pipeline.sql_client() as client:
+        assert client.execute_sql("SELECT count(*) FROM players_games")[0][0] == len(GAMES)
+
+
+def test_months_before_the_cursor_are_backfilled_once(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, "OFFICIAL_CHESS_API_URL", f"{stub_server.url}/pub/")
+    months = {"2023/11": 1698796800, "2023/12": 1701388800}
+    archives = {month: f"/pub/player/someone/games/{month}" for month in months}
+    stub_server.respond(
+        "/pub/player/someone/games/archives",
+        (200, {}, json.dumps({"archives": [stub_server.url + path for path in archives.values()]}).encode()),
+    )
+    for month, start in months.items():
+        games = [{"url": f"https://www.chess.com/game/live/{start + i}", "end_time": start + i} for i in range(3)]
+        stub_server.respond(archives[month], (200, {}, json.dumps({"games": games}).encode()))
+
+    pipeline = dlt.pipeline(
+        pipeline_name="chess_backfill_test",
+        pipelines_dir=str(tmp_path),
+        destination=dlt.destinations.duckdb(str(tmp_path / "games.duckdb")),
+        dataset_name="chess",
+    )
+    for start_month in ("2023/12", "2023/11", "2023/11"):
+        pipeline.run(
+            source(["someone"], start_month=start_month, end_month="2023/12").with_resources("players_games")
+        )
+
+    assert len(stub_server.requests_for(archives["2023/11"])) == 1
+    with pipeline.sql_client() as client:
+        assert client.execute_sql("SELECT count(*) FROM players_games")[0][0] == 6
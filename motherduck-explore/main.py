@@ -1,15 +1,17 @@
 from dotenv import load_dotenv
-import os
 
-import duckdb
+from query_layer import QueryLayer
 
 def main():
     load_dotenv()
 
-    conn = duckdb.connect('md:sample_data')
-    print(conn.sql("SHOW DATABASES").show())
+    # one connection to a local file, which only attaches md:sample_data when a query isn't in there yet (or has
+    # expired) - set MOTHERDUCK_REMOTE to a local DuckDB file to run this offline
+    layer = QueryLayer()
+    print(layer.query("SELECT * FROM sample_data.nyc.taxi LIMIT 5;"))
 
-    print(conn.sql("SELECT * FROM sample_data.nyc.taxi LIMIT 5;"))
+    # sample_data is only in here if the query above wasn't cached yet
+    layer.sql("SHOW DATABASES").show()
 
 
 if __name__ == "__main__":
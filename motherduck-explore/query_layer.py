@@ -0,0 +1,131 @@
+"""
+A small query layer for exploring MotherDuck without paying for the attach and the round trip on every query.
+
+Everything goes through one DuckDB connection to a local database file, and the remote database is only attached the
+first time something actually has to be read from it. Query results and whole tables can be copied into the local
+file, and are read from there until they're older than their TTL, so repeated analysis runs at local speed - and
+across runs too, since the file stays around.
+
+The remote doesn't have to be MotherDuck: any DuckDB database file works in place of 'md:sample_data', attached
+under the same name, which is how this can be tried out offline (see MOTHERDUCK_REMOTE).
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+import duckdb
+
+# overridden by MOTHERDUCK_REMOTE and MOTHERDUCK_LOCAL_PATH, which are read when a QueryLayer is made rather than at
+# import, so they can come from a .env file loaded after the imports
+DEFAULT_REMOTE = "md:sample_data"
+DEFAULT_LOCAL_PATH = os.path.join(".cache", "motherduck_local.duckdb")
+DEFAULT_TTL = 60 * 60
+
+
+def remote_alias(remote):
+    """The name the remote database is attached under: 'sample_data' for both md:sample_data and sample_data.duckdb"""
+    if remote.startswith("md:"):
+        return remote[len("md:"):].split("?")[0]
+    return os.path.splitext(os.path.basename(remote))[0]
+
+
+class QueryLayer:
+    def __init__(self, remote=None, local_path=None, ttl=DEFAULT_TTL):
+        remote = remote or os.getenv("MOTHERDUCK_REMOTE", DEFAULT_REMOTE)
+        local_path = local_path or os.getenv("MOTHERDUCK_LOCAL_PATH", DEFAULT_LOCAL_PATH)
+        self.remote = remote
+        self.alias = remote_alias(remote)
+        self.ttl = ttl
+        if local_path != ":memory:":
+            os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        self.conn = duckdb.connect(local_path)
+        self._attached = False
+        self._lock = threading.RLock()
+        self.conn.execute("CREATE SCHEMA IF NOT EXISTS mirror")
+        self.conn.execute("CREATE SCHEMA IF NOT EXISTS results")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                local_table VARCHAR PRIMARY KEY,
+                source VARCHAR,
+                refreshed_at DOUBLE
+            )
+        """)
+
+    def attach(self):
+        """
+        Attaches the remote database, if it isn't already. table() and query() do this themselves when they have to
+        read from the remote, so it's only needed to query the remote directly through sql()
+        """
+        with self._lock:
+            if not self._attached:
+                if self.remote.startswith("md:"):
+                    self.conn.execute(f"ATTACH '{self.remote}'")
+                else:
+                    self.conn.execute(f"ATTACH '{self.remote}' AS {self.alias} (READ_ONLY)")
+                self._attached = True
+
+    def sql(self, query, params=None):
+        """Runs a query on the connection as is - against the local file, and the remote if it's attached"""
+        with self._lock:
+            if params is None:
+                return self.conn.sql(query)
+            return self.conn.execute(query, params)
+
+    def _is_fresh(self, local_table, ttl):
+        row = self.conn.execute(
+            "SELECT refreshed_at FROM cache_entries WHERE local_table = ?", [local_table]
+        ).fetchone()
+        return row is not None and time.time() - row[0] < (self.ttl if ttl is None else ttl)
+
+    def _refresh(self, local_table, source, select, params=None):
+        # copied in one statement, so the rows go straight from the remote into the local file
+        self.attach()
+        self.conn.execute(f"CREATE OR REPLACE TABLE {local_table} AS {select}", params)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?)", [local_table, source, time.time()]
+        )
+
+    def table(self, name, ttl=None):
+        """
+        Makes sure there's a local copy of the remote table `name` (like sample_data.nyc.taxi) that isn't older than
+        `ttl` seconds, and returns its name to use in queries instead
+        """
+        if not re.fullmatch(r"[\w.]+", name):
+            raise ValueError(f"not a table name: {name}")
+        local_table = "mirror." + name.replace(".", "__")
+        with self._lock:
+            if not self._is_fresh(local_table, ttl):
+                self._refresh(local_table, name, f"SELECT * FROM {name}")
+        return local_table
+
+    def query(self, query, params=None, ttl=None):
+        """
+        Returns the result of `query` against the remote as a relation, from the local copy of the result if the same
+        query (and params) ran less than `ttl` seconds ago
+        """
+        key = hashlib.sha256(repr((query, params)).encode()).hexdigest()[:32]
+        local_table = f"results.r_{key}"
+        with self._lock:
+            if not self._is_fresh(local_table, ttl):
+                self._refresh(local_table, query, query, params)
+            return self.conn.sql(f"SELECT * FROM {local_table}")
+
+    def invalidate(self, source=None):
+        """Drops the local copies of `source` (a table name or query), or all of them"""
+        with self._lock:
+            if source is None:
+                rows = self.conn.execute("SELECT local_table FROM cache_entries").fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT local_table FROM cache_entries WHERE source = ?", [source]
+                ).fetchall()
+            for (local_table,) in rows:
+                self.conn.execute(f"DROP TABLE IF EXISTS {local_table}")
+                self.conn.execute("DELETE FROM cache_entries WHERE local_table = ?", [local_table])
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,102 @@
+import duckdb
+import pytest
+
+import query_layer
+from query_layer import QueryLayer
+
+TAXI = "sample_data.nyc.taxi"
+COUNT = f"SELECT count(*) AS trips FROM {TAXI}"
+
+
+@pytest.fixture
+def remote(tmp_path):
+    # stands in for md:sample_data, attached under the same name
+    path = tmp_path / "sample_data.duckdb"
+    conn = duckdb.connect(str(path))
+    conn.execute("CREATE SCHEMA nyc")
+    conn.execute("CREATE TABLE nyc.taxi AS SELECT range AS id, range * 1.5 AS fare FROM range(3)")
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def local_path(tmp_path):
+    return str(tmp_path / "local" / "motherduck_local.duckdb")
+
+
+def layer(remote, local_path, **kwargs):
+    return QueryLayer(remote=str(remote), local_path=local_path, **kwargs)
+
+
+def local_tables(ql, schema):
+    return [name for (name,) in ql.sql(f"SELECT table_name FROM duckdb_tables() WHERE schema_name = '{schema}'").fetchall()]
+
+
+def add_trip(remote):
+    conn = duckdb.connect(str(remote))
+    conn.execute("INSERT INTO nyc.taxi VALUES (3, 4.5)")
+    conn.close()
+
+
+def test_query_result_is_kept_in_results(remote, local_path):
+    ql = layer(remote, local_path)
+    assert ql.query(COUNT).fetchall() == [(3,)]
+    [name] = local_tables(ql, "results")
+    assert ql.sql(f"SELECT * FROM results.{name}").fetchall() == [(3,)]
+    assert ql.sql("SELECT source FROM cache_entries").fetchall() == [(COUNT,)]
+    ql.close()
+
+
+def test_second_layer_serves_the_result_without_attaching(remote, local_path):
+    first = layer(remote, local_path)
+    first.query(COUNT)
+    first.close()
+    add_trip(remote)
+
+    second = layer(remote, local_path)
+    assert second.query(COUNT).fetchall() == [(3,)]
+    assert not second._attached
+    assert "sample_data" not in [name for (name,) in second.sql("SELECT database_name FROM duckdb_databases()").fetchall()]
+    second.close()
+
+
+def test_result_is_refreshed_once_its_ttl_is_over(remote, local_path, monkeypatch):
+    first = layer(remote, local_path, ttl=60)
+    first.query(COUNT)
+    first.close()
+    add_trip(remote)
+
+    second = layer(remote, local_path, ttl=60)
+    now = query_layer.time.time()
+    monkeypatch.setattr(query_layer.time, "time", lambda: now + 61)
+    assert second.query(COUNT).fetchall() == [(4,)]
+    assert second._attached
+    # a ttl passed to query() wins over the layer's
+    assert second.query(COUNT, ttl=3600).fetchall() == [(4,)]
+    second.close()
+
+
+def test_table_mirrors_the_remote_table(remote, local_path):
+    ql = layer(remote, local_path)
+    mirror = ql.table(TAXI)
+    assert mirror == "mirror.sample_data__nyc__taxi"
+    assert ql.sql(f"SELECT id, fare FROM {mirror} ORDER BY id").fetchall() == [(0, 0.0), (1, 1.5), (2, 3.0)]
+    with pytest.raises(ValueError):
+        ql.table("nyc.taxi; DROP TABLE cache_entries")
+    ql.close()
+
+
+def test_invalidate_drops_tables_and_entries(remote, local_path):
+    ql = layer(remote, local_path)
+    ql.table(TAXI)
+    ql.query(COUNT)
+
+    ql.invalidate(TAXI)
+    assert local_tables(ql, "mirror") == []
+    assert len(local_tables(ql, "results")) == 1
+    assert ql.sql("SELECT source FROM cache_entries").fetchall() == [(COUNT,)]
+
+    ql.invalidate()
+    assert local_tables(ql, "results") == []
+    assert ql.sql("SELECT count(*) FROM cache_entries").fetchall() == [(0,)]
+    ql.close()
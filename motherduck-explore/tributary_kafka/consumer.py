@@ -0,0 +1,245 @@
+"""
+Materializes the IceCube alerts from setup_views.sql into a DuckDB table, instead of views that rescan the whole topic
+and parse every message again on each query.
+
+The topic is read in micro-batches. Each batch is decoded and parsed once - with the same extraction as the
+icecube_alerts view - and appended to the icecube_alerts table, together with the next offset of every partition in
+kafka_offsets, in one transaction. So a consumer that's stopped or crashes starts again right after the last batch
+that made it into the table, and query_demo.sql runs against local columnar storage:
+
+    python consumer.py --db icecube.duckdb                               # GCN, like setup_views.sql
+    python consumer.py --db icecube.duckdb --bootstrap localhost:9092    # a local Kafka/Redpanda, no auth
+    python consumer.py --db icecube.duckdb --replay messages.jsonl       # a file with one message per line
+    duckdb icecube.duckdb < query_demo.sql
+
+Reading from Kafka needs confluent-kafka; replaying a file doesn't.
+"""
+
+import argparse
+import os
+import time
+from collections import namedtuple
+
+import duckdb
+
+TOPIC = "gcn.notices.icecube.lvk_nu_track_search"
+GROUP_ID = "test123"
+BATCH_SIZE = 500
+POLL_TIMEOUT = 5.0
+
+GCN_CONFIG = {
+    "bootstrap.servers": "kafka.gcn.nasa.gov",
+    "sasl.mechanisms": "OAUTHBEARER",
+    "sasl.oauthbearer.method": "oidc",
+    "sasl.oauthbearer.token.endpoint.url": "https://auth.gcn.nasa.gov/oauth2/token",
+    "security.protocol": "sasl_ssl",
+}
+
+Message = namedtuple("Message", ["partition", "offset", "value"])
+
+CREATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS icecube_alerts (
+    topic VARCHAR,
+    partition INTEGER,
+    "offset" BIGINT,
+    ref_id VARCHAR,
+    alert_datetime TIMESTAMP,
+    pval_bayesian DOUBLE,
+    n_events_coincident INTEGER,
+    flux_sensitivity DOUBLE[],
+    sensitive_energy_range INTEGER[],
+    message JSON
+);
+
+CREATE TABLE IF NOT EXISTS kafka_offsets (
+    topic VARCHAR,
+    partition INTEGER,
+    next_offset BIGINT,
+    PRIMARY KEY (topic, partition)
+);
+"""
+
+# the same extraction as the icecube_alerts view in setup_views.sql, run once per batch instead of on every query.
+# Every field is a TRY_CAST: a message that isn't valid JSON, or has a field that doesn't convert, keeps NULLs in
+# those columns (and the message itself) rather than failing the batch - which would fail again on every restart,
+# since the offsets only move on with a batch that made it in
+INSERT_BATCH_SQL = """
+INSERT INTO icecube_alerts
+SELECT
+    topic,
+    partition,
+    "offset",
+    message ->> '$.ref_ID' AS ref_id,
+    TRY_CAST(message ->> '$.alert_datetime' AS timestamp) AS alert_datetime,
+    TRY_CAST(message ->> '$.pval_bayesian' AS double) AS pval_bayesian,
+    TRY_CAST(message ->> '$.n_events_coincident' AS integer) AS n_events_coincident,
+    TRY_CAST(message ->> '$.neutrino_flux_sensitivity_range.flux_sensitivity' AS double[]) AS flux_sensitivity,
+    TRY_CAST(message ->> '$.neutrino_flux_sensitivity_range.sensitive_energy_range' AS integer[])
+        AS sensitive_energy_range,
+    message
+FROM (
+    SELECT topic, partition, "offset", CASE WHEN json_valid(value) THEN value::json END AS message
+    FROM (SELECT ? AS topic, unnest(?) AS partition, unnest(?) AS "offset", unnest(?) AS value)
+)
+"""
+
+
+class KafkaSource:
+    """Reads a topic with confluent-kafka, starting each partition at the offset stored in DuckDB"""
+
+    def __init__(self, topic, config, start_offsets):
+        from confluent_kafka import Consumer
+
+        self.topic = topic
+        self.start_offsets = start_offsets
+        self.consumer = Consumer({**config, "enable.auto.commit": False, "auto.offset.reset": "earliest"})
+        self.consumer.subscribe([topic], on_assign=self._on_assign)
+
+    def _on_assign(self, consumer, partitions):
+        for partition in partitions:
+            if partition.partition in self.start_offsets:
+                partition.offset = self.start_offsets[partition.partition]
+        consumer.assign(partitions)
+
+    def poll(self, max_messages, timeout):
+        from confluent_kafka import KafkaError, KafkaException
+
+        messages = []
+        for message in self.consumer.consume(max_messages, timeout):
+            if message.error():
+                if message.error().code() == KafkaError._PARTITION_EOF:
+                    continue
+                raise KafkaException(message.error())
+            messages.append(Message(message.partition(), message.offset(), message.value()))
+        return messages
+
+    def commit(self, offsets):
+        # DuckDB has the offsets that count, this is so the consumer group's lag shows up on the broker too
+        from confluent_kafka import TopicPartition
+
+        self.consumer.commit(
+            offsets=[TopicPartition(self.topic, partition, offset) for partition, offset in offsets.items()],
+            asynchronous=True,
+        )
+
+    def close(self):
+        self.consumer.close()
+
+
+class ReplaySource:
+    """Replays a file with one message per line as partition 0, where a message's offset is its line number"""
+
+    def __init__(self, path, start_offsets, follow=False):
+        self.file = open(path, "rb")
+        self.follow = follow
+        self.offset = 0
+        for _ in range(start_offsets.get(0, 0)):
+            if not self.file.readline():
+                break
+            self.offset += 1
+
+    def poll(self, max_messages, timeout):
+        messages = []
+        while len(messages) < max_messages:
+            line = self.file.readline()
+            if not line:
+                break
+            if line.strip():
+                messages.append(Message(0, self.offset, line.rstrip(b"\r\n")))
+            self.offset += 1
+        if not messages and self.follow:
+            # like tail -f: wait a bit for lines to be appended, rather than spinning
+            time.sleep(timeout)
+        return messages
+
+    def commit(self, offsets):
+        pass
+
+    def close(self):
+        self.file.close()
+
+
+def connect(path):
+    conn = duckdb.connect(path)
+    conn.execute(CREATE_TABLES_SQL)
+    return conn
+
+
+def stored_offsets(conn, topic):
+    rows = conn.execute("SELECT partition, next_offset FROM kafka_offsets WHERE topic = ?", [topic]).fetchall()
+    return dict(rows)
+
+
+def write_batch(conn, topic, messages):
+    """Appends the messages and moves the stored offsets past them, all or nothing. Returns the new offsets."""
+    offsets = {}
+    for message in messages:
+        offsets[message.partition] = max(offsets.get(message.partition, 0), message.offset + 1)
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute(INSERT_BATCH_SQL, [
+            topic,
+            [message.partition for message in messages],
+            [message.offset for message in messages],
+            [message.value.decode("utf-8", errors="replace") for message in messages],
+        ])
+        conn.executemany(
+            "INSERT OR REPLACE INTO kafka_offsets VALUES (?, ?, ?)",
+            [[topic, partition, offset] for partition, offset in offsets.items()],
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return offsets
+
+
+def consume(conn, source, topic, batch_size=BATCH_SIZE, poll_timeout=POLL_TIMEOUT, follow=False):
+    """Moves messages from source into the table batch by batch, until it runs dry (or forever with follow)"""
+    total = 0
+    while True:
+        messages = source.poll(batch_size, poll_timeout)
+        if not messages:
+            if follow:
+                continue
+            return total
+        source.commit(write_batch(conn, topic, messages))
+        total += len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize the IceCube alerts topic into a DuckDB table")
+    parser.add_argument("--db", default="icecube.duckdb", help="DuckDB file with the icecube_alerts table")
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--bootstrap", help="bootstrap servers of an unauthenticated Kafka, instead of GCN")
+    parser.add_argument("--replay", help="read messages from this file, one per line, instead of Kafka")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--follow", action="store_true", help="keep polling for new messages")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    offsets = stored_offsets(conn, args.topic)
+    if args.replay:
+        source = ReplaySource(args.replay, offsets, args.follow)
+    elif args.bootstrap:
+        source = KafkaSource(args.topic, {"bootstrap.servers": args.bootstrap, "group.id": GROUP_ID}, offsets)
+    else:
+        source = KafkaSource(args.topic, {
+            **GCN_CONFIG,
+            "group.id": GROUP_ID,
+            "sasl.oauthbearer.client.id": os.getenv("GCN_ICECUBE_ID"),
+            "sasl.oauthbearer.client.secret": os.getenv("GCN_ICECUBE_SECRET"),
+        }, offsets)
+
+    started = time.perf_counter()
+    try:
+        count = consume(conn, source, args.topic, args.batch_size, follow=args.follow)
+    finally:
+        source.close()
+    print(f"{count} messages added in {time.perf_counter() - started:.1f}s, "
+          f"{conn.execute('SELECT count(*) FROM icecube_alerts').fetchone()[0]} in icecube_alerts")
+
+
+if __name__ == "__main__":
+    main()
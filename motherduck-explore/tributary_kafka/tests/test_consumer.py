@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import consumer
+
+TOPIC = "alerts"
+
+GOOD = {
+    "ref_ID": "S240101a",
+    "alert_datetime": "2024-01-01T12:00:00Z",
+    "pval_bayesian": 0.25,
+    "n_events_coincident": 2,
+    "neutrino_flux_sensitivity_range": {"flux_sensitivity": [0.1, 0.2], "sensitive_energy_range": [100, 200]},
+}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = consumer.connect(str(tmp_path / "alerts.duckdb"))
+    yield conn
+    conn.close()
+
+
+def replay(conn, tmp_path, messages, batch_size=consumer.BATCH_SIZE):
+    path = tmp_path / "messages.jsonl"
+    with open(path, "a", encoding="utf-8") as f:
+        for message in messages:
+            f.write((message if isinstance(message, str) else json.dumps(message)) + "\n")
+    source = consumer.ReplaySource(str(path), consumer.stored_offsets(conn, TOPIC))
+    try:
+        return consumer.consume(conn, source, TOPIC, batch_size, poll_timeout=0)
+    finally:
+        source.close()
+
+
+def rows(conn):
+    return conn.execute(f"""
+        SELECT "offset", ref_id, alert_datetime, pval_bayesian, n_events_coincident, flux_sensitivity,
+            sensitive_energy_range, message IS NOT NULL
+        FROM icecube_alerts ORDER BY "offset"
+    """).fetchall()
+
+
+def test_fields_that_dont_convert_are_null(conn, tmp_path):
+    bad_fields = {
+        **GOOD,
+        "ref_ID": "S240101b",
+        "alert_datetime": "yesterday",
+        "pval_bayesian": "small",
+        "n_events_coincident": "many",
+        "neutrino_flux_sensitivity_range": {"flux_sensitivity": ["a"], "sensitive_energy_range": "wide"},
+    }
+    assert replay(conn, tmp_path, [GOOD, bad_fields, "not json"]) == 3
+
+    good, bad, invalid = rows(conn)
+    assert good[1:4] == ("S240101a", good[2], 0.25) and good[2].year == 2024
+    assert good[4:] == (2, [0.1, 0.2], [100, 200], True)
+    # the message is kept, so the fields can be fixed up from it later
+    # (TRY_CAST converts a list element by element)
+    assert bad == (1, "S240101b", None, None, None, [None], None, True)
+    assert invalid == (2, None, None, None, None, None, None, False)
+
+
+def test_a_bad_message_doesnt_stop_the_consumer(conn, tmp_path):
+    # the batch with the bad message goes in, and the next run carries on after it instead of failing on it again
+    assert replay(conn, tmp_path, [GOOD, {**GOOD, "alert_datetime": "yesterday"}], batch_size=1) == 2
+    assert consumer.stored_offsets(conn, TOPIC) == {0: 2}
+
+    assert replay(conn, tmp_path, [{**GOOD, "ref_ID": "S240102a"}]) == 1
+    assert [row[1] for row in rows(conn)] == ["S240101a", "S240101a", "S240102a"]
+    assert consumer.stored_offsets(conn, TOPIC) == {0: 3}
@@ -0,0 +1,58 @@
+import itertools
+from collections import Counter
+
+import pytest
+
+import dice_frequency as df
+
+
+def brute_force_counts(die, number_of_dice):
+    faces = [value for value, count in die.items() for _ in range(count)]
+    return Counter(sum(roll) for roll in itertools.product(faces, repeat=number_of_dice))
+
+
+def test_all_up_dict_for_dice_matches_notebook():
+    assert df.all_up_dict_for_dice(df.single_dragonwoods_die, 1) == {1: 1, 2: 2, 3: 2, 4: 1}
+    assert df.all_up_dict_for_dice(df.single_dragonwoods_die, 2) == {2: 1, 3: 4, 4: 8, 5: 10, 6: 8, 7: 4, 8: 1}
+    assert sum(df.all_up_dict_for_dice(df.single_dragonwoods_die, 6).values()) == 46656
+
+
+def test_chance_of_getting_value_or_lower_matches_notebook():
+    assert df.chance_of_getting_value_or_lower() == pytest.approx({1: 1.0, 2: 5 / 6, 3: 0.5, 4: 1 / 6})
+
+    three = df.chance_of_getting_value_or_lower(df.single_dragonwoods_die, 3)
+    assert three[3] == 1.0
+    assert three[4] == pytest.approx(0.9953703703703703)
+    assert three[8] == pytest.approx(0.5)
+    assert three[12] == pytest.approx(1 / 216)
+
+    d6 = df.chance_of_getting_value_or_lower(df.single_d6, 6)
+    assert d6[7] == pytest.approx(0.9999785665294925)
+    assert d6[21] == pytest.approx(0.5464248971193415)
+
+
+@pytest.mark.parametrize('die', [df.single_dragonwoods_die, df.single_d6, {2: 1, 5: 3}])
+@pytest.mark.parametrize('number_of_dice', [1, 2, 3, 4, 5])
+def test_counts_match_brute_force(die, number_of_dice):
+    assert df.all_up_dict_for_dice(die, number_of_dice) == dict(brute_force_counts(die, number_of_dice))
+
+
+@pytest.mark.parametrize('number_of_dice', [1, 2, 3, 4])
+def test_at_least_cdf_and_sf_match_brute_force(number_of_dice):
+    counts = brute_force_counts(df.single_dragonwoods_die, number_of_dice)
+    total = sum(counts.values())
+
+    values, at_least = df.at_least(df.single_dragonwoods_die, number_of_dice)
+    _, cdf = df.cdf(df.single_dragonwoods_die, number_of_dice)
+    _, sf = df.sf(df.single_dragonwoods_die, number_of_dice)
+    for value, p_at_least, p_cdf, p_sf in zip(values, at_least, cdf, sf):
+        assert p_at_least == pytest.approx(sum(c for v, c in counts.items() if v >= value) / total)
+        assert p_cdf == pytest.approx(sum(c for v, c in counts.items() if v <= value) / total)
+        # scipy's convention: strictly greater
+        assert p_sf == pytest.approx(sum(c for v, c in counts.items() if v > value) / total)
+        assert p_sf == pytest.approx(1 - p_cdf)
+
+
+def test_large_counts_stay_exact():
+    _, counts = df.sum_counts(df.single_d6, 40)
+    assert sum(counts) == 6 ** 40
@@ -0,0 +1,205 @@
+"""
+Ingests the Upworthy Research Archive CSVs into Parquet, once, for the notebooks to query.
+
+Each archive CSV is read with an explicit schema - no sniffing the types from a sample - and written to its own
+partition of a hive-partitioned Parquet dataset, datasets/parquet/exps/source_type=<type>/data.parquet. A manifest
+next to it records the size, mtime and SHA-256 of each CSV as it was converted, so running ingest() again only
+converts the files that have changed (a file that was only touched is hashed, found to be the same, and skipped).
+
+Queries then go against the Parquet files, reading only the columns and partitions they need:
+
+    conn = duckdb.connect()
+    ingest.ingest()
+    ingest.scan(conn, ["clickability_test_id", "impressions", "clicks"], source_types=["holdout"]).fetchall()
+
+or with ingest.create_view(conn), as an exps view with the same columns as the old exps table.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import duckdb
+
+DATASETS_DIR = "datasets"
+PARQUET_DIR = os.path.join(DATASETS_DIR, "parquet", "exps")
+MANIFEST_PATH = os.path.join(DATASETS_DIR, "parquet", "manifest.json")
+
+# filenames are of the format upworthy-archive-confirmatory-packages-03.12.2020.csv
+SOURCES = {
+    "confirmatory": "upworthy-archive-confirmatory-packages-03.12.2020.csv",
+    "exploratory": "upworthy-archive-exploratory-packages-03.12.2020.csv",
+    "holdout": "upworthy-archive-holdout-packages-03.12.2020.csv",
+    "undeployed": "upworthy-archive-undeployed-packages.01.12.2021.csv",
+}
+SOURCE_TYPES = list(SOURCES)
+
+# the columns of the exps table, in order, with their types; source_type comes from the partition
+COLUMNS = {
+    "id": "BIGINT",
+    "created_at": "TIMESTAMP",
+    "updated_at": "TIMESTAMP",
+    "clickability_test_id": "VARCHAR",
+    "excerpt": "VARCHAR",
+    "headline": "VARCHAR",
+    "lede": "VARCHAR",
+    "slug": "VARCHAR",
+    "eyecatcher_id": "VARCHAR",
+    "impressions": "BIGINT",
+    "clicks": "BIGINT",
+    "significance": "DOUBLE",
+    "first_place": "BOOLEAN",
+    "winner": "BOOLEAN",
+    "share_text": "VARCHAR",
+    "square": "VARCHAR",
+    "test_week": "INTEGER",
+}
+
+
+def csv_columns(source_type):
+    """The columns as they are in the CSV: the id column has no name in the first three, and undeployed has
+    _id instead and no test_week"""
+    columns = dict(COLUMNS)
+    del columns["id"]
+    if source_type == "undeployed":
+        del columns["test_week"]
+        return {"_id": "BIGINT", **columns}
+    return {"column00": "BIGINT", **columns}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def partition_path(source_type, parquet_dir=PARQUET_DIR):
+    return os.path.join(parquet_dir, f"source_type={source_type}", "data.parquet")
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    # written to a temp file first, so an interrupted run can't leave half a manifest behind
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def convert(conn, csv_path, source_type, parquet_path):
+    """Converts one CSV to Parquet, in one pass, with the columns renamed and ordered as in COLUMNS"""
+    columns = csv_columns(source_type)
+    id_column = next(iter(columns))
+    test_week = "test_week" if "test_week" in columns else "NULL::INTEGER AS test_week"
+    select_list = ", ".join(
+        [f"{id_column} AS id"]
+        + [name for name in COLUMNS if name not in ("id", "test_week")]
+        + [test_week]
+    )
+    columns_struct = "{" + ", ".join(f"'{name}': '{type_}'" for name, type_ in columns.items()) + "}"
+
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    conn.execute(f"""
+        COPY (
+            SELECT {select_list}
+            FROM read_csv('{csv_path}', header = true, auto_detect = false, delim = ',', columns = {columns_struct},
+                          quote = '"', escape = '"', nullstr = ['', 'NA'])
+        ) TO '{parquet_path}.tmp' (FORMAT parquet, COMPRESSION zstd)
+    """)
+    os.replace(parquet_path + ".tmp", parquet_path)
+
+
+def ingest(datasets_dir=DATASETS_DIR, parquet_dir=PARQUET_DIR, manifest_path=MANIFEST_PATH, force=False,
+           conn=None):
+    """
+    Converts the archive CSVs in datasets_dir that are new or have changed since the last run, and returns
+    {source_type: 'converted' | 'unchanged' | 'missing'}
+    """
+    conn = conn or duckdb.connect()
+    manifest = load_manifest(manifest_path)
+    results = {}
+    for source_type, filename in SOURCES.items():
+        csv_path = os.path.join(datasets_dir, filename)
+        parquet_path = partition_path(source_type, parquet_dir)
+        if not os.path.exists(csv_path):
+            results[source_type] = "missing"
+            continue
+
+        stat = os.stat(csv_path)
+        entry = manifest.get(source_type)
+        if not force and entry is not None and os.path.exists(parquet_path):
+            if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                results[source_type] = "unchanged"
+                continue
+            # the size or mtime changed, but that can be just a copy or a touch - only the contents count
+            digest = file_hash(csv_path)
+            if entry["size"] == stat.st_size and entry["sha256"] == digest:
+                manifest[source_type] = {**entry, "mtime_ns": stat.st_mtime_ns}
+                save_manifest(manifest, manifest_path)
+                results[source_type] = "unchanged"
+                continue
+        else:
+            digest = file_hash(csv_path)
+
+        started = time.perf_counter()
+        convert(conn, csv_path, source_type, parquet_path)
+        rows = conn.execute(f"SELECT count(*) FROM '{parquet_path}'").fetchone()[0]
+        manifest[source_type] = {
+            "csv": filename,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "rows": rows,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        save_manifest(manifest, manifest_path)
+        results[source_type] = "converted"
+    return results
+
+
+def scan(conn, columns=None, source_types=None, parquet_dir=PARQUET_DIR):
+    """
+    A relation over the Parquet files with just `columns` (all of them if None) from just the `source_types`
+    partitions (all of them if None) - nothing is read until it's used, and then only those columns and files
+    """
+    source_types = SOURCE_TYPES if source_types is None else list(source_types)
+    unknown = [source_type for source_type in source_types if source_type not in SOURCES]
+    if unknown:
+        raise ValueError(f"unknown source types: {unknown}")
+    paths = [partition_path(source_type, parquet_dir) for source_type in source_types]
+    paths = [path for path in paths if os.path.exists(path)]
+    if not paths:
+        raise FileNotFoundError(f"no Parquet files for {source_types} in {parquet_dir}, run ingest() first")
+
+    columns = list(COLUMNS) + ["source_type"] if columns is None else list(columns)
+    unknown = [column for column in columns if column not in COLUMNS and column != "source_type"]
+    if unknown:
+        raise ValueError(f"unknown columns: {unknown}")
+    return conn.sql(
+        f"SELECT {', '.join(columns)} FROM read_parquet({paths!r}, hive_partitioning = true)"
+    )
+
+
+def create_view(conn, name="exps", parquet_dir=PARQUET_DIR):
+    """Creates a view over all the Parquet files, so queries written against the exps table work as they are -
+    DuckDB still only reads the columns a query uses, and only the partitions its source_type filter allows"""
+    pattern = os.path.join(parquet_dir, "source_type=*", "*.parquet")
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW {name} AS
+        SELECT {', '.join(COLUMNS)}, source_type
+        FROM read_parquet('{pattern}', hive_partitioning = true)
+    """)
+
+
+if __name__ == "__main__":
+    for source_type, result in ingest().items():
+        print(f"{source_type}: {result}")
@@ -0,0 +1,262 @@
+"""
+Statistics for all the Upworthy clickability tests at once: the CTR of every package, two-proportion z-tests between
+every pair of packages in the same test, the posterior probability that each package is the best in its test, and
+bootstrap intervals for how much each package beats (or trails) the best of the others.
+
+Nothing loops over tests in Python. The per-package numbers and the pairs come out of DuckDB SQL over the Parquet
+files from ingest.py, and the simulations work on the packages laid out as a (tests, packages) array - padded to the
+biggest test - with NumPy broadcasting over a third, draws, axis. That's done in chunks of tests to bound memory,
+and the chunks can be spread across a process pool:
+
+    conn = duckdb.connect()
+    results = stats.score(conn, workers=8)
+    pandas.DataFrame(results["packages"])
+"""
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import duckdb
+import numpy as np
+
+import ingest
+
+# undeployed packages were never shown, so they have no impressions to test
+SOURCE_TYPES = ["confirmatory", "exploratory", "holdout"]
+# Beta(1, 1), uniform, prior on each package's CTR
+PRIOR_ALPHA = 1.0
+PRIOR_BETA = 1.0
+DRAWS = 1000
+BOOTSTRAP_DRAWS = 1000
+CONFIDENCE = 0.95
+# the most samples held in memory at once, per process
+CHUNK_SAMPLES = 20_000_000
+
+PACKAGES_SQL = """
+SELECT
+    clickability_test_id,
+    id,
+    source_type,
+    impressions,
+    clicks,
+    clicks / impressions AS ctr,
+    dense_rank() OVER (ORDER BY clickability_test_id) - 1 AS test_index,
+    row_number() OVER (PARTITION BY clickability_test_id ORDER BY id) - 1 AS package_index
+FROM packages
+WHERE impressions > 0
+ORDER BY test_index, package_index
+"""
+
+# every pair of packages in a test, once, with the pooled two-proportion z statistic
+PAIRS_SQL = """
+WITH pairs AS (
+    SELECT
+        a.clickability_test_id,
+        a.id AS id_a,
+        b.id AS id_b,
+        a.ctr AS ctr_a,
+        b.ctr AS ctr_b,
+        (a.clicks + b.clicks) / (a.impressions + b.impressions) AS pooled_ctr,
+        1 / a.impressions + 1 / b.impressions AS inverse_impressions
+    FROM scored a
+    JOIN scored b ON a.test_index = b.test_index AND a.package_index < b.package_index
+)
+SELECT
+    clickability_test_id,
+    id_a,
+    id_b,
+    ctr_a,
+    ctr_b,
+    ctr_a - ctr_b AS difference,
+    CASE WHEN pooled_ctr > 0 AND pooled_ctr < 1
+        THEN (ctr_a - ctr_b) / sqrt(pooled_ctr * (1 - pooled_ctr) * inverse_impressions)
+        ELSE 0.0 END AS z
+FROM pairs
+ORDER BY clickability_test_id, id_a, id_b
+"""
+
+
+def normal_sf(z):
+    """P(Z > z) for a standard normal, elementwise - erfc with the Abramowitz and Stegun 7.1.26 approximation
+    (error under 1.5e-7), since NumPy has no erf and SciPy isn't a dependency"""
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    upper_tail = 0.5 * poly * np.exp(-x * x)
+    return np.where(z >= 0, upper_tail, 1 - upper_tail)
+
+
+def load_packages(conn, source_types=SOURCE_TYPES):
+    """One row per package that was shown, as a dict of arrays, sorted by test"""
+    scanned = ingest.scan(
+        conn, ["clickability_test_id", "id", "source_type", "impressions", "clicks"], source_types
+    )
+    return scanned.query("packages", PACKAGES_SQL).fetchnumpy()
+
+
+def pairwise_tests(conn, source_types=SOURCE_TYPES):
+    """A z-test between every two packages in the same test, as a dict of arrays"""
+    scanned = ingest.scan(
+        conn, ["clickability_test_id", "id", "source_type", "impressions", "clicks"], source_types
+    )
+    pairs = scanned.query("packages", PACKAGES_SQL).query("scored", PAIRS_SQL).fetchnumpy()
+    pairs["p_value"] = 2 * normal_sf(np.abs(pairs["z"]))
+    return pairs
+
+
+def padded(packages):
+    """The packages' impressions and clicks as (tests, packages) arrays, with a mask for the real cells"""
+    test_index = packages["test_index"].astype(np.int64)
+    package_index = packages["package_index"].astype(np.int64)
+    shape = (test_index.max() + 1, package_index.max() + 1)
+    impressions = np.zeros(shape, dtype=np.int64)
+    clicks = np.zeros(shape, dtype=np.int64)
+    mask = np.zeros(shape, dtype=bool)
+    impressions[test_index, package_index] = packages["impressions"]
+    clicks[test_index, package_index] = packages["clicks"]
+    mask[test_index, package_index] = True
+    return impressions, clicks, mask
+
+
+def chunks(n_tests, n_packages, draws):
+    """Ranges of tests small enough that a (tests, packages, draws) array fits in CHUNK_SAMPLES"""
+    size = max(1, CHUNK_SAMPLES // (n_packages * draws))
+    return [(start, min(start + size, n_tests)) for start in range(0, n_tests, size)]
+
+
+def map_chunks(function, impressions, clicks, mask, draws, workers, seed, *args):
+    """
+    Runs function(impressions, clicks, mask, draws, *args, seed) on each chunk of tests - in parallel across `workers`
+    processes when there's more than one - and stacks up the arrays it returns
+    """
+    ranges = chunks(len(impressions), impressions.shape[1], draws)
+    # independent streams per chunk, so the result doesn't depend on how many workers there are
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    chunk_args = [
+        (impressions[start:stop], clicks[start:stop], mask[start:stop], draws, *args, chunk_seed)
+        for (start, stop), chunk_seed in zip(ranges, seed.spawn(len(ranges)))
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(function, *zip(*chunk_args)))
+    else:
+        results = [function(*arguments) for arguments in chunk_args]
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def _win_chunk(impressions, clicks, mask, draws, seed):
+    rng = np.random.default_rng(seed)
+    n_tests, n_packages = impressions.shape
+    # only the real packages are sampled, the padding just never wins
+    samples = np.full((n_tests, n_packages, draws), -np.inf, dtype=np.float32)
+    samples[mask] = rng.beta(
+        PRIOR_ALPHA + clicks[mask, None], PRIOR_BETA + (impressions - clicks)[mask, None], size=(mask.sum(), draws)
+    )
+    best = samples.argmax(axis=1)
+    # how often each package is the best, counted in one go for the whole chunk
+    cells = np.arange(n_tests)[:, None] * n_packages + best
+    counts = np.bincount(cells.ravel(), minlength=n_tests * n_packages)
+    return (counts.reshape(n_tests, n_packages) / draws,)
+
+
+def win_probabilities(impressions, clicks, mask, draws=DRAWS, workers=1, seed=None):
+    """
+    For each package, the posterior probability that its CTR is the highest in its test, with a Beta-Binomial model:
+    draws from every package's Beta posterior, and the share of draws where it comes out on top
+    """
+    (wins,) = map_chunks(_win_chunk, impressions, clicks, mask, draws, workers, seed)
+    return wins
+
+
+def _bootstrap_chunk(impressions, clicks, mask, draws, confidence, seed):
+    n_tests, n_packages = impressions.shape
+    low = np.full(impressions.shape, np.nan)
+    high = np.full(impressions.shape, np.nan)
+    if n_packages < 2:
+        # a package alone in its test has no others to compare to
+        return low, high
+
+    rng = np.random.default_rng(seed)
+    resampled_ctr = np.full((n_tests, n_packages, draws), -np.inf, dtype=np.float32)
+    resampled = rng.binomial(impressions[mask, None], (clicks / impressions.clip(min=1))[mask, None],
+                             size=(mask.sum(), draws))
+    resampled_ctr[mask] = resampled / impressions[mask, None]
+
+    # the best of the others is the top CTR, except for the package that has it, where it's the runner-up
+    is_best = resampled_ctr.argmax(axis=1)[:, None, :] == np.arange(n_packages)[None, :, None]
+    top = resampled_ctr.max(axis=1, keepdims=True)
+    runner_up = np.where(is_best, -np.inf, resampled_ctr).max(axis=1, keepdims=True)
+    best_of_others = np.where(is_best, runner_up, top)
+
+    # and only the packages with others in their test get an interval
+    compared = mask & np.isfinite(best_of_others).all(axis=2)
+    lift = resampled_ctr[compared] - best_of_others[compared]
+    tail = (1 - confidence) / 2
+    low[compared], high[compared] = np.quantile(lift, [tail, 1 - tail], axis=1)
+    return low, high
+
+
+def bootstrap_intervals(impressions, clicks, mask, draws=BOOTSTRAP_DRAWS, confidence=CONFIDENCE, workers=1,
+                        seed=None):
+    """
+    (low, high) arrays with the percentile bootstrap interval of each package's CTR minus the best CTR of the others
+    in its test, resampling clicks from a binomial with the observed CTR (a parametric bootstrap)
+    """
+    return map_chunks(_bootstrap_chunk, impressions, clicks, mask, draws, workers, seed, confidence)
+
+
+def score(conn, source_types=SOURCE_TYPES, draws=DRAWS, bootstrap_draws=BOOTSTRAP_DRAWS, confidence=CONFIDENCE,
+          workers=1, seed=None):
+    """
+    Everything for every test in source_types: {'packages': per-package CTR, win probability and bootstrap interval,
+    'pairs': the pairwise z-tests, 'seconds': how long each step took}, as dicts of arrays
+    """
+    seconds = {}
+    started = time.perf_counter()
+    packages = load_packages(conn, source_types)
+    seconds["load"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pairs = pairwise_tests(conn, source_types)
+    seconds["pairs"] = time.perf_counter() - started
+
+    impressions, clicks, mask = padded(packages)
+    cells = (packages["test_index"], packages["package_index"])
+    seed_sequence = np.random.SeedSequence(seed)
+    posterior_seed, bootstrap_seed = seed_sequence.spawn(2)
+
+    started = time.perf_counter()
+    packages["win_probability"] = win_probabilities(impressions, clicks, mask, draws, workers, posterior_seed)[cells]
+    seconds["posterior"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    low, high = bootstrap_intervals(impressions, clicks, mask, bootstrap_draws, confidence, workers, bootstrap_seed)
+    packages["lift_low"] = low[cells]
+    packages["lift_high"] = high[cells]
+    seconds["bootstrap"] = time.perf_counter() - started
+
+    return {"packages": packages, "pairs": pairs, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every Upworthy clickability test")
+    parser.add_argument("--source-types", nargs="+", default=SOURCE_TYPES, choices=ingest.SOURCE_TYPES)
+    parser.add_argument("--draws", type=int, default=DRAWS)
+    parser.add_argument("--bootstrap-draws", type=int, default=BOOTSTRAP_DRAWS)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    results = score(duckdb.connect(), args.source_types, args.draws, args.bootstrap_draws, workers=args.workers,
+                    seed=args.seed)
+    packages = results["packages"]
+    print(f"{len(np.unique(packages['test_index']))} tests, {len(packages['id'])} packages, "
+          f"{len(results['pairs']['z'])} pairs, "
+          f"{(results['pairs']['p_value'] < 1 - CONFIDENCE).sum()} pairs significant at {1 - CONFIDENCE:.2f}")
+    print(", ".join(f"{step} {seconds:.2f}s" for step, seconds in results["seconds"].items()))
+
+
+if __name__ == "__main__":
+    main()
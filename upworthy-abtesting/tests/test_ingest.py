@@ -0,0 +1,97 @@
+import os
+
+import duckdb
+import pytest
+
+import ingest
+
+HEADER = ("created_at,updated_at,clickability_test_id,excerpt,headline,lede,slug,eyecatcher_id,impressions,clicks,"
+          "significance,first_place,winner,share_text,square")
+
+
+def archive_csv(source_type, rows):
+    """A CSV laid out like the archive's: an unnamed id column and test_week, or _id and no test_week in undeployed"""
+    if source_type == "undeployed":
+        lines = ["_id," + HEADER]
+        lines += [f'{id_},2014-11-20 11:33:26.475,2016-04-02 16:33:38.062,t{test},,"Headline, {id_}",NA,slug,e1,'
+                  f"{impressions},{clicks},NA,FALSE,FALSE,,," for id_, test, impressions, clicks in rows]
+    else:
+        lines = ["," + HEADER + ",test_week"]
+        lines += [f'{id_},2014-11-20 11:33:26.475,2016-04-02 16:33:38.062,t{test},,"Headline, {id_}",NA,slug,e1,'
+                  f"{impressions},{clicks},12.5,TRUE,FALSE,,,201446" for id_, test, impressions, clicks in rows]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    datasets_dir = tmp_path / "datasets"
+    datasets_dir.mkdir()
+    for number, source_type in enumerate(ingest.SOURCE_TYPES):
+        rows = [(number * 10 + 1, number, 100, 5), (number * 10 + 2, number, 200, 20)]
+        (datasets_dir / ingest.SOURCES[source_type]).write_text(archive_csv(source_type, rows))
+    return datasets_dir
+
+
+def run(datasets, tmp_path):
+    return ingest.ingest(str(datasets), str(tmp_path / "parquet"), str(tmp_path / "manifest.json"))
+
+
+def every(result):
+    return {source_type: result for source_type in ingest.SOURCE_TYPES}
+
+
+def test_only_changed_files_are_converted_again(datasets, tmp_path):
+    assert run(datasets, tmp_path) == every("converted")
+    assert run(datasets, tmp_path) == every("unchanged")
+
+    # a touch changes the mtime but not the contents
+    path = datasets / ingest.SOURCES["holdout"]
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert run(datasets, tmp_path) == every("unchanged")
+    assert ingest.load_manifest(str(tmp_path / "manifest.json"))["holdout"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+    path.write_text(archive_csv("holdout", [(21, 2, 100, 6), (22, 2, 200, 20)]))
+    assert run(datasets, tmp_path) == {**every("unchanged"), "holdout": "converted"}
+
+
+def test_missing_files_are_reported(datasets, tmp_path):
+    os.remove(datasets / ingest.SOURCES["exploratory"])
+    assert run(datasets, tmp_path) == {**every("converted"), "exploratory": "missing"}
+
+
+def test_every_layout_gets_the_same_columns(datasets, tmp_path):
+    run(datasets, tmp_path)
+    conn = duckdb.connect()
+    parquet_dir = str(tmp_path / "parquet")
+
+    relation = ingest.scan(conn, parquet_dir=parquet_dir)
+    assert relation.columns == list(ingest.COLUMNS) + ["source_type"]
+    rows = relation.order("id").fetchall()
+    assert [(row[0], row[5], row[6], row[-2], row[-1]) for row in rows] == [
+        (1, "Headline, 1", None, 201446, "confirmatory"),
+        (2, "Headline, 2", None, 201446, "confirmatory"),
+        (11, "Headline, 11", None, 201446, "exploratory"),
+        (12, "Headline, 12", None, 201446, "exploratory"),
+        (21, "Headline, 21", None, 201446, "holdout"),
+        (22, "Headline, 22", None, 201446, "holdout"),
+        (31, "Headline, 31", None, None, "undeployed"),
+        (32, "Headline, 32", None, None, "undeployed"),
+    ]
+
+
+def test_scan_reads_only_the_columns_and_partitions_asked_for(datasets, tmp_path):
+    run(datasets, tmp_path)
+    conn = duckdb.connect()
+    parquet_dir = str(tmp_path / "parquet")
+
+    relation = ingest.scan(conn, ["id", "clicks"], ["holdout", "undeployed"], parquet_dir=parquet_dir)
+    assert relation.columns == ["id", "clicks"]
+    assert sorted(relation.fetchall()) == [(21, 5), (22, 20), (31, 5), (32, 20)]
+
+    with pytest.raises(ValueError):
+        ingest.scan(conn, ["id", "nope"], parquet_dir=parquet_dir)
+    with pytest.raises(ValueError):
+        ingest.scan(conn, source_types=["nope"], parquet_dir=parquet_dir)
+    with pytest.raises(FileNotFoundError):
+        ingest.scan(conn, source_types=["holdout"], parquet_dir=str(tmp_path / "elsewhere"))
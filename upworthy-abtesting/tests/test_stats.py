@@ -0,0 +1,63 @@
+import math
+
+import duckdb
+import numpy as np
+import pytest
+
+import ingest
+import stats
+
+# test a has a clear winner, test b has a single package
+PACKAGES = [("a", 1, 1000, 100), ("a", 2, 1000, 50), ("b", 3, 500, 25)]
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    # load_packages and pairwise_tests read ingest's default, relative, Parquet directory
+    monkeypatch.chdir(tmp_path)
+    conn = duckdb.connect()
+    path = ingest.partition_path("holdout")
+    (tmp_path / path).parent.mkdir(parents=True)
+    values = ", ".join(f"('{test}', {id_}, {impressions}, {clicks})" for test, id_, impressions, clicks in PACKAGES)
+    conn.execute(f"""
+        COPY (SELECT * FROM (VALUES {values}) AS packages (clickability_test_id, id, impressions, clicks))
+        TO '{path}' (FORMAT parquet)
+    """)
+    yield conn
+    conn.close()
+
+
+def score(conn, workers=1):
+    return stats.score(conn, ["holdout"], draws=2000, bootstrap_draws=2000, workers=workers, seed=42)
+
+
+def test_pairwise_p_value_matches_the_two_proportion_z_test(conn):
+    pairs = stats.pairwise_tests(conn, ["holdout"])
+    pooled = 150 / 2000
+    z = (0.1 - 0.05) / math.sqrt(pooled * (1 - pooled) * (1 / 1000 + 1 / 1000))
+
+    assert list(pairs["id_a"]) == [1] and list(pairs["id_b"]) == [2]
+    assert pairs["z"][0] == pytest.approx(z)
+    assert pairs["p_value"][0] == pytest.approx(math.erfc(z / math.sqrt(2)), abs=1e-7)
+
+
+def test_win_probabilities_and_intervals(conn):
+    packages = score(conn)["packages"]
+    tests = packages["clickability_test_id"]
+
+    for test in ("a", "b"):
+        assert packages["win_probability"][tests == test].sum() == pytest.approx(1)
+    assert packages["win_probability"][0] > 0.99
+    # the winner beats the other package, which trails it
+    assert packages["lift_low"][0] > 0 and packages["lift_high"][1] < 0
+    assert np.isnan(packages["lift_low"][2]) and np.isnan(packages["lift_high"][2])
+
+
+def test_results_do_not_depend_on_the_number_of_workers(conn, monkeypatch):
+    # one test per chunk, so the two workers each get one
+    monkeypatch.setattr(stats, "CHUNK_SAMPLES", 2 * 2000)
+    serial = score(conn, workers=1)["packages"]
+    parallel = score(conn, workers=2)["packages"]
+
+    for column in ("win_probability", "lift_low", "lift_high"):
+        np.testing.assert_array_equal(serial[column], parallel[column])
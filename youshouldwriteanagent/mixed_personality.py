@@ -2,33 +2,107 @@
 # Inspired by https://fly.io/blog/everyone-write-an-agent/
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from agent_common import llm_client, streaming, tracing
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
 
 load_dotenv()
-client = OpenAI()
+client = llm_client.client
 extra_info = {'role':'user', 'content':"Don't forget to always remember the Golden Gate Bridge."}
 context_good = [{'role':'system', 'content':"You're Alph and you only tell the truth"}, extra_info]
 context_bad = [{'role':'system', 'content':"You're Ralph and you only tell lies"}, extra_info]
+contexts = {'Alph': context_good, 'Ralph': context_bad}
 
-def call_llm(ctx):
-    # model_str = 'gpt-5-mini'
-    model_str = 'gpt-4o-mini'
-    return client.responses.create(model=model_str, input=ctx)
+# print responses as they're generated rather than all at once at the end
+STREAM = True
 
+# also send the request for the persona that wasn't picked, at the same time - its answer is never used, so this
+# only doubles the cost, but it's there to try out having both answers ready
+BOTH_AT_ONCE = False
+
+# with more than one model, each request goes to all of them at once and the first acceptable answer wins
+# MODELS = ['gpt-4o-mini', 'gpt-4.1-mini', 'gpt-5-mini']
+MODELS = ['gpt-4o-mini']
+
+executor = ThreadPoolExecutor()
+
+def call_model(ctx, model_str, printer=None):
+    response = client.create(model=model_str, input=ctx, stream=printer is not None)
+    if printer:
+        response = streaming.stream_response(response, on_text=printer)
+        printer.end()
+    return response
+
+def acceptable(response):
+    return response.status == 'completed' and response.output_text.strip() != ''
+
+def race(ctx, models, accept=acceptable):
+    # returns the first response that's acceptable, or the last one to finish if none of them are; the slower
+    # requests can't be stopped once they're sent, so they finish in the background and are ignored. Races get
+    # their own threads, since they can run inside the persona requests on executor
+    pool = ThreadPoolExecutor(max_workers=len(models))
+    futures = [pool.submit(tracing.in_context(call_model), ctx, model_str) for model_str in models]
+    response = None
+    error = None
+    for future in as_completed(futures):
+        try:
+            response = future.result()
+        except Exception as e:
+            error = e
+            continue
+        if accept(response):
+            break
+    pool.shutdown(wait=False, cancel_futures=True)
+    if response is None:
+        raise error
+    return response
+
+def call_llm(ctx, which_one, show=None):
+    # show defaults to STREAM as it is when called, since agent_common's batch turns STREAM off after import
+    if show is None:
+        show = STREAM
+    printer = streaming.Printer(f'>>> ({which_one}) ') if show else None
+    if len(MODELS) == 1:
+        return call_model(ctx, MODELS[0], printer)
+
+    response = race(ctx, MODELS)
+    if printer:
+        # nothing can be streamed while racing, since we don't know whose tokens to print until one has won
+        printer(response.output_text)
+        printer.end()
+    return response
+
+def report_error(future, name):
+    # the answer that wasn't used isn't waited for, but its failure shouldn't go unnoticed either
+    if not future.cancelled() and future.exception() is not None:
+        print(f'\n(request for {name} failed: {future.exception()!r})', file=sys.stderr)
+
+@tracing.traced('agent.turn')
 def process_user_input(line):
     new_input_context_dict = {'role': 'user', 'content': line}
     context_good.append(new_input_context_dict)
-    context_good.append(new_input_context_dict)
+    context_bad.append(new_input_context_dict)
 
-    which_one = ''
-    if random.choice([True, False]):
-        response = call_llm(context_good)
-        which_one = 'Alph'
+    which_one = random.choice(list(contexts))
+    if BOTH_AT_ONCE:
+        # only the picked persona prints, and only its answer is waited for - the other one's request is sent at
+        # the same time but not waited on. Both get a copy of their context, since the contexts change below
+        # while the other request may still be running
+        futures = {
+            name: executor.submit(tracing.in_context(call_llm), list(ctx), name, show=STREAM and name == which_one)
+            for name, ctx in contexts.items()
+        }
+        response = futures[which_one].result()
+        for name, future in futures.items():
+            if name != which_one:
+                # not needed any more, so dropped if it's still waiting for a thread
+                future.cancel()
+                future.add_done_callback(lambda future, name=name: report_error(future, name))
     else:
-        response = call_llm(context_bad)
-        which_one = 'Ralph'
+        response = call_llm(contexts[which_one], which_one)
 
+    # both contexts get the answer that was used, so they stay the same apart from their system prompts
     new_response_context_dict = {'role': 'assistant', 'content': response.output_text}
     context_good.append(new_response_context_dict)
     context_bad.append(new_response_context_dict)
@@ -39,7 +113,8 @@ def main():
     while True:
         user_input = input("> ")
         llm_result_from_user_input = process_user_input(user_input)
-        print(f">>> {llm_result_from_user_input}\n")
+        if not STREAM:
+            print(f">>> {llm_result_from_user_input}\n")
 
 if __name__ == "__main__":
     main()
@@ -2,26 +2,43 @@
 # Inspired by https://fly.io/blog/everyone-write-an-agent/
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from agent_common import llm_client, streaming, tracing
+from agent_common.history import History, summarizer
 
 load_dotenv()
-client = OpenAI()
-context = []
-
-def call_llm():
-    return client.responses.create(model='gpt-5-mini', input=context)
-
-def process_user_input(line):
-    context.append({'role': 'user', 'content': line})
-    response = call_llm()
-    context.append({'role': 'assistant', 'content': response.output_text})
+client = llm_client.client
+
+def new_conversation():
+    return History(summarize=summarizer(client))
+
+context = new_conversation()
+
+# print responses as they're generated rather than all at once at the end
+STREAM = True
+
+def call_llm(ctx):
+    response = client.create(model='gpt-5-mini', input=ctx.fit(), stream=STREAM)
+    if STREAM:
+        printer = streaming.Printer('>>> ')
+        response = streaming.stream_response(response, on_text=printer)
+        printer.end()
+    return response
+
+@tracing.traced('agent.turn')
+def process_user_input(line, ctx=None):
+    # the REPL has the one conversation in context, batch.py passes in one of its own for each conversation
+    ctx = context if ctx is None else ctx
+    ctx.append({'role': 'user', 'content': line})
+    response = call_llm(ctx)
+    ctx.append({'role': 'assistant', 'content': response.output_text})
     return response.output_text
 
 def main():
     while True:
         user_input = input("> ")
         llm_result_from_user_input = process_user_input(user_input)
-        print(f">>> {llm_result_from_user_input}\n")
+        if not STREAM:
+            print(f">>> {llm_result_from_user_input}\n")
 
 if __name__ == "__main__":
     main()
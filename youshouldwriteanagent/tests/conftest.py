@@ -0,0 +1,63 @@
+# A fake OpenAI Responses endpoint for the tests: a local http server that answers each model with its own text
+# after its own delay, and keeps the body of every request it gets. Streaming isn't faked.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import pytest
+from agent_common import llm_client
+
+def response_json(model, text):
+    return {'id': 'resp_1', 'object': 'response', 'created_at': 0, 'model': model, 'status': 'completed',
+            'output': [{'type': 'message', 'id': 'msg_1', 'role': 'assistant', 'status': 'completed',
+                        'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}],
+            'parallel_tool_calls': True, 'tool_choice': 'auto', 'tools': [], 'temperature': 1, 'top_p': 1,
+            'error': None, 'incomplete_details': None, 'instructions': None, 'metadata': {},
+            'usage': {'input_tokens': 10, 'input_tokens_details': {'cached_tokens': 0}, 'output_tokens': 5,
+                      'output_tokens_details': {'reasoning_tokens': 0}, 'total_tokens': 15}}
+
+class FakeOpenAI:
+    def __init__(self):
+        self.answers = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with fake._lock:
+                    fake.requests.append(body)
+                text, delay = fake.answers.get(body['model'], ('', 0))
+                time.sleep(delay)
+                data = json.dumps(response_json(body['model'], text)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, model, text, delay=0):
+        # what model answers, and how many seconds it takes to
+        self.answers[model] = (text, delay)
+
+    def client(self, cache_dir):
+        return llm_client.Client(cache_dir=str(cache_dir), base_url=self.url, api_key='test', max_retries=0)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def fake_openai():
+    fake = FakeOpenAI()
+    yield fake
+    fake.close()
@@ -0,0 +1,36 @@
+import time
+import pytest
+import mixed_personality
+
+CONTEXT = [{'role': 'user', 'content': 'hello'}]
+
+@pytest.fixture
+def llm(fake_openai, monkeypatch, tmp_path):
+    monkeypatch.setattr(mixed_personality, 'client', fake_openai.client(tmp_path / 'cache'))
+    return fake_openai
+
+def test_race_returns_the_fast_model_without_waiting_for_the_slow_one(llm):
+    llm.answer('slow', 'slow answer', delay=2)
+    llm.answer('fast', 'fast answer')
+
+    started = time.perf_counter()
+    response = mixed_personality.race(CONTEXT, ['slow', 'fast'])
+
+    assert response.output_text == 'fast answer'
+    assert time.perf_counter() - started < 1.5
+    assert sorted(request['model'] for request in llm.requests) == ['fast', 'slow']
+
+def test_race_skips_an_unacceptable_answer(llm):
+    llm.answer('fast', '')
+    llm.answer('slow', 'slow answer', delay=0.3)
+
+    assert mixed_personality.race(CONTEXT, ['fast', 'slow']).output_text == 'slow answer'
+
+def test_call_llm_reads_stream_when_called(llm, monkeypatch, capsys):
+    monkeypatch.setattr(mixed_personality, 'MODELS', ['fast'])
+    monkeypatch.setattr(mixed_personality, 'STREAM', False)
+    llm.answer('fast', 'fast answer')
+
+    assert mixed_personality.call_llm(CONTEXT, 'Alph').output_text == 'fast answer'
+    assert not llm.requests[0].get('stream')
+    assert capsys.readouterr().out == ''